@@ -0,0 +1,38 @@
+"""
+JWT authentication backed by a short-lived user cache.
+
+The access token already names the user, so the User row is loaded once
+and then served from the cache for settings.USER_CACHE_SECONDS. Saving or
+deleting a user drops its entry (see signals.py); the short TTL bounds
+staleness in other worker processes, whose caches that signal can't reach.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache_key(user_id) -> str:
+    return f'accounts:user:{user_id}'
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = cache.get(user_cache_key(user_id)) if user_id is not None else None
+        if user is None:
+            # Missing claim, unknown or inactive user: the parent raises.
+            user = super().get_user(validated_token)
+            cache.set(user_cache_key(user_id), user, settings.USER_CACHE_SECONDS)
+            return user
+
+        # The parent's checks, for a user it didn't load.
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('الحساب غير مفعل', code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed('تم تغيير كلمة المرور، يرجى تسجيل الدخول مجدداً', code='password_changed')
+        return user
@@ -0,0 +1,14 @@
+from rest_framework.permissions import BasePermission
+
+
+class IsAdminRole(BasePermission):
+    """Allows access only to users with the 'admin' role (or Django staff)."""
+
+    message = 'هذه الصفحة متاحة للإدارة فقط'
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(
+            user and user.is_authenticated
+            and (user.role == 'admin' or user.is_staff)
+        )
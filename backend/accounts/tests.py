@@ -1,3 +1,78 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedJWTAuthentication, api_settings, user_cache_key
+from .tokens import PROFILE_CLAIMS, tokens_for_user
+
+User = get_user_model()
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'teacher', password='secret', role='student', full_name='معلمة', school_name='الأمل',
+        )
+        self.auth = CachedJWTAuthentication()
+        self.token = str(tokens_for_user(self.user).access_token).encode()
+
+    def authenticate(self, token=None):
+        return self.auth.get_user(self.auth.get_validated_token(token or self.token))
+
+    def test_cache_hit_makes_no_queries(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(), self.user)
+
+    def test_role_change_is_seen_at_once(self):
+        self.authenticate()
+        self.user.role = 'admin'
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertEqual(self.authenticate().role, 'admin')
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_stale_cached_inactive_user_is_rejected(self):
+        # e.g. cached by another process before it saw the change
+        self.user.is_active = False
+        cache.set(user_cache_key(self.user.pk), self.user)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate()
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_token_from_before_a_password_change_is_revoked(self):
+        # simplejwt modules hold api_settings by reference, so override_settings can't reach them.
+        with mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True):
+            old = str(tokens_for_user(self.user).access_token).encode()
+            self.user.set_password('changed')
+            self.user.save()
+            self.authenticate(str(tokens_for_user(self.user).access_token).encode())  # caches the new password
+            with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed) as raised:
+                self.authenticate(old)
+            self.assertEqual(raised.exception.get_codes(), 'password_changed')
+
 
-# Create your tests here.
+class TokensForUserTests(TestCase):
+    def test_profile_claims(self):
+        user = User.objects.create_user('admin', role='admin', full_name='مدير', school_name='النور')
+        refresh = tokens_for_user(user)
+        for token in (refresh, refresh.access_token):
+            self.assertEqual({claim: token[claim] for claim in PROFILE_CLAIMS},
+                             {'role': 'admin', 'full_name': 'مدير', 'school_name': 'النور'})
+            self.assertEqual(token['user_id'], str(user.pk))
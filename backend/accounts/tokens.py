@@ -0,0 +1,13 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# Profile fields the app can read straight from the token. They are a
+# snapshot from login time; the server always checks the live user.
+PROFILE_CLAIMS = ('role', 'full_name', 'school_name')
+
+
+def tokens_for_user(user) -> RefreshToken:
+    """Refresh token (and, through it, access token) carrying PROFILE_CLAIMS."""
+    refresh = RefreshToken.for_user(user)
+    for claim in PROFILE_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    return refresh
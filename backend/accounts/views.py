@@ -2,8 +2,8 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import LoginSerializer, UserSerializer
+from .tokens import tokens_for_user
 
 
 @api_view(['POST'])
@@ -30,7 +30,7 @@ def login_view(request):
         )
 
     user = serializer.validated_data['user']
-    refresh = RefreshToken.for_user(user)
+    refresh = tokens_for_user(user)
 
     return Response({
         'access': str(refresh.access_token),
@@ -44,6 +44,6 @@ def login_view(request):
 def me_view(request):
     """
     GET /api/auth/me/
-    Returns current user profile.
+    Returns current user profile (served from the user cache, not the database).
     """
     return Response(UserSerializer(request.user).data)
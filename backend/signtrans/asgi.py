@@ -13,4 +13,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'signtrans.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up: the handler uses models and settings.
+from videos.live import live_recognition  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await live_recognition(scope, receive, send)
+    return await django_application(scope, receive, send)
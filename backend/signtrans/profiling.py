@@ -0,0 +1,98 @@
+"""
+Opt-in request profiling for staff.
+
+A staff user sends ``X-Profile: 1`` with any request; the request runs
+under cProfile and the response carries ``X-Profile-URL`` pointing at the
+stored profile. Requests without the header only pay for one header lookup.
+
+cProfile follows the request thread only: work handed to the upstream
+thread pool shows up as time spent waiting on its futures.
+"""
+import io
+import uuid
+import pstats
+import cProfile
+import threading
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+
+from accounts.authentication import CachedJWTAuthentication
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+REPORT_LINES = 60
+
+# Python allows a single active profiler per process.
+_profiler_lock = threading.Lock()
+
+
+def _is_staff(request) -> bool:
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    # The API authenticates with JWT inside DRF, after middleware has run.
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, TokenError):
+        return False
+    return bool(result and result[0].is_staff)
+
+
+def _prune():
+    profiles = sorted(settings.PROFILE_DIR.glob('*.prof'), key=lambda p: p.stat().st_mtime)
+    for old in profiles[:-settings.PROFILE_KEEP]:
+        old.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.META.get(PROFILE_HEADER):
+            return self.get_response(request)
+        if not _is_staff(request) or not _profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            _profiler_lock.release()
+
+        profile_id = uuid.uuid4()
+        settings.PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(settings.PROFILE_DIR / f'{profile_id}.prof')
+        _prune()
+
+        response['X-Profile-URL'] = request.build_absolute_uri(f'/api/profiles/{profile_id}/')
+        return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_view(request, profile_id):
+    """
+    GET /api/profiles/<id>/
+    Plain-text report sorted by cumulative time; ?raw=1 returns the
+    raw pstats file for snakeviz, pstats or similar tools.
+    """
+    path = settings.PROFILE_DIR / f'{profile_id}.prof'
+    if not path.exists():
+        raise Http404
+
+    if request.query_params.get('raw'):
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+
+    out = io.StringIO()
+    stats = pstats.Stats(str(path), stream=out)
+    stats.sort_stats('cumulative').print_stats(REPORT_LINES)
+    return HttpResponse(out.getvalue(), content_type='text/plain; charset=utf-8')
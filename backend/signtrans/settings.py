@@ -2,6 +2,7 @@
 Django settings for signtrans project.
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -46,6 +47,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'signtrans.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'signtrans.urls'
@@ -98,7 +100,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # ---------------------------------------------------------------------------
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -115,11 +117,60 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Authenticated users are cached this long; saving a user drops the entry.
+USER_CACHE_SECONDS = 60
+
 # ---------------------------------------------------------------------------
 # CORS (allow Flutter app to connect)
 # ---------------------------------------------------------------------------
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_HEADERS = ['*']
+CORS_EXPOSE_HEADERS = ['Location', 'Upload-Offset', 'Upload-Length', 'X-Profile-URL']
+
+# ---------------------------------------------------------------------------
+# Video analysis (upstream models)
+# ---------------------------------------------------------------------------
+# Step 1 needs a video-capable model; step 2 is text-only and can use a
+# cheaper, faster one. A slow primary is hedged with the fallback model.
+ANALYSIS_MODELS = {
+    'describe': {
+        'model': os.getenv('DESCRIBE_MODEL', 'google/gemini-3-flash-preview'),
+        'fallback': os.getenv('DESCRIBE_FALLBACK_MODEL', 'google/gemini-2.5-flash'),
+    },
+    'match': {
+        'model': os.getenv('MATCH_MODEL', 'google/gemini-3-flash-preview'),
+        'fallback': os.getenv('MATCH_FALLBACK_MODEL', 'google/gemini-2.5-flash'),
+    },
+}
+ANALYSIS_HEDGE_PERCENTILE = 95       # hedge once the primary is slower than its p95
+ANALYSIS_HEDGE_MIN_SAMPLES = 20      # ...but only after this many observed calls
+ANALYSIS_CIRCUIT_FAILURE_THRESHOLD = 5
+ANALYSIS_CIRCUIT_RESET_SECONDS = 30
+# Threads for hedged upstream calls, shared by all requests in a process.
+ANALYSIS_UPSTREAM_WORKERS = 64
+
+# Time budget for one analysis request; clients may ask for less with the
+# X-Request-Timeout header. Stages are skipped once less than the minimum remains.
+ANALYSIS_DEADLINE_SECONDS = 90
+ANALYSIS_MIN_STAGE_SECONDS = 2
+
+# Batch analysis: clips per request, their combined upload size and how
+# many step-1 calls run at once.
+BATCH_MAX_CLIPS = 30
+BATCH_MAX_TOTAL_MB = 100
+BATCH_DESCRIBE_CONCURRENCY = 4
+BATCH_DEADLINE_SECONDS = 300
+
+# Live recognition over WebSocket (videos/live.py): segments waiting for
+# analysis per connection (newer ones are dropped) and each one's budget.
+LIVE_MAX_PENDING_SEGMENTS = 2
+LIVE_SEGMENT_DEADLINE_SECONDS = 30
+
+# Reuse a recent analysis when a new clip's fingerprint is this close
+# (Jaccard distance of motion masks, 0 = identical, 1 = unrelated).
+FINGERPRINT_MAX_DISTANCE = 0.25
+FINGERPRINT_REUSE_WINDOW = timedelta(days=7)
+FINGERPRINT_MAX_CANDIDATES = 200
 
 # ---------------------------------------------------------------------------
 # Internationalization
@@ -136,4 +187,13 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Resumable uploads are assembled here, outside MEDIA_ROOT so they are never served.
+CHUNKED_UPLOAD_DIR = BASE_DIR / 'upload_chunks'
+CHUNKED_UPLOAD_EXPIRY = timedelta(hours=24)
+
+# Request profiles captured for staff with the X-Profile header; only the
+# most recent PROFILE_KEEP are kept.
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_KEEP = 200
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -5,9 +5,12 @@ from django.conf.urls.static import static
 
 from videos.urls import admin_panel_urlpatterns
 
+from .profiling import profile_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/videos/', include('videos.urls')),
+    path('api/profiles/<uuid:profile_id>/', profile_view, name='request_profile'),
     path('admin-panel/avatars/', include(admin_panel_urlpatterns)),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,3 +1,22 @@
 from django.contrib import admin
+from .models import Analysis, DailySchoolRollup, DailySignRollup
 
-# Register your models here.
+
+@admin.register(Analysis)
+class AnalysisAdmin(admin.ModelAdmin):
+    list_display = ('user', 'matched_sign', 'outcome', 'total_ms', 'created_at')
+    list_filter = ('outcome', 'school_name')
+    search_fields = ('user__username', 'matched_sign', 'content_hash')
+    raw_id_fields = ('user',)
+
+
+@admin.register(DailySignRollup)
+class DailySignRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'sign_name', 'count', 'total_ms')
+    list_filter = ('day',)
+
+
+@admin.register(DailySchoolRollup)
+class DailySchoolRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'school_name', 'count', 'matched', 'failed', 'total_ms')
+    list_filter = ('day',)
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(using, **kwargs):
+    # Any migration that rebuilds videos_signavatar on SQLite drops the FTS
+    # sync triggers; put them back after every migrate.
+    from django.db import connections
+
+    from .search import ensure_fts_index
+    ensure_fts_index(connections[using])
 
 
 class VideosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'videos'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(restore_search_index, sender=self)
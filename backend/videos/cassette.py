@@ -0,0 +1,95 @@
+"""
+Record/replay of upstream model traffic for offline, deterministic runs.
+
+Each request body is hashed; the response is stored as one JSON file per
+hash. In replay mode nothing leaves the process and a missing recording is
+an error, so results only change when the prompts or inputs change.
+"""
+import json
+import time
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+
+import requests
+
+from . import utils
+
+MODES = ("replay", "record", "auto")
+
+
+class CassetteMiss(RuntimeError):
+    """No recorded response exists for a request while replaying."""
+
+
+class Cassette:
+    def __init__(self, directory: Path, mode: str = "replay"):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.events = []
+
+    @staticmethod
+    def key(body: dict) -> str:
+        raw = json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def send(self, stage: str, body: dict, timeout: float) -> requests.Response:
+        key = self.key(body)
+        path = self.directory / f"{key}.json"
+
+        if path.exists() and self.mode != "record":
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        elif self.mode == "replay":
+            raise CassetteMiss(f"No recorded {stage} response for request {key[:12]}")
+        else:
+            started = time.monotonic()
+            resp = utils.http_send(stage, body, timeout)
+            entry = {
+                "stage": stage,
+                "model": body.get("model"),
+                "status": resp.status_code,
+                "latency_ms": round((time.monotonic() - started) * 1000),
+                "body": resp.content.decode("utf-8", errors="replace"),
+            }
+            # Errors and rate limits are transient; only pin real answers into replays.
+            if 200 <= resp.status_code < 300:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                path.write_text(json.dumps(entry, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        self.events.append({
+            "stage": entry["stage"],
+            "model": entry["model"],
+            "latency_ms": entry["latency_ms"],
+            "usage": _usage(entry["body"]),
+        })
+        return _response(entry)
+
+    def take_events(self) -> list[dict]:
+        events, self.events = self.events, []
+        return events
+
+    @contextmanager
+    def installed(self):
+        previous = utils.transport
+        utils.transport = self.send
+        try:
+            yield self
+        finally:
+            utils.transport = previous
+
+
+def _usage(body: str) -> dict:
+    try:
+        return json.loads(body).get("usage") or {}
+    except (ValueError, AttributeError):
+        return {}
+
+
+def _response(entry: dict) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = entry["status"]
+    resp._content = entry["body"].encode("utf-8")
+    resp.encoding = "utf-8"
+    return resp
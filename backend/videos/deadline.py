@@ -0,0 +1,54 @@
+"""
+Per-request time budgets for analysis.
+
+A Deadline is created when the request arrives, from the client's
+``X-Request-Timeout`` header (seconds) or settings.ANALYSIS_DEADLINE_SECONDS,
+and is passed down through every stage. Each upstream call gets the smaller
+of its own timeout and what is left of the budget; once less than
+settings.ANALYSIS_MIN_STAGE_SECONDS remains, further stages are skipped.
+"""
+import time
+
+from django.conf import settings
+
+DEADLINE_HEADER = 'HTTP_X_REQUEST_TIMEOUT'
+
+
+class DeadlineExceeded(RuntimeError):
+    """The request's time budget ran out before the analysis finished."""
+
+    def __init__(self, message='انتهت المهلة المحددة للتحليل، حاول مرة أخرى'):
+        super().__init__(message)
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_request(cls, request, seconds: float | None = None) -> 'Deadline':
+        """
+        Budget of ``seconds`` (settings.ANALYSIS_DEADLINE_SECONDS by default).
+        The client may shorten it, never extend it.
+        """
+        seconds = seconds or settings.ANALYSIS_DEADLINE_SECONDS
+        try:
+            requested = float(request.META.get(DEADLINE_HEADER, ''))
+        except ValueError:
+            requested = None
+        if requested and requested > 0:
+            seconds = min(seconds, requested)
+        return cls(seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """Raise DeadlineExceeded if too little time is left to start a stage."""
+        if self.remaining() < settings.ANALYSIS_MIN_STAGE_SECONDS:
+            raise DeadlineExceeded()
+
+    def timeout(self, cap: float) -> float:
+        """Timeout for the next upstream call: ``cap`` shrunk to the budget."""
+        self.check()
+        return min(cap, self.remaining())
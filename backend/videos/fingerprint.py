@@ -0,0 +1,255 @@
+"""
+Perceptual fingerprints for near-duplicate detection.
+
+FRAME_COUNT evenly timed frames are shrunk to 8x8 grey thumbnails and
+compared with their average, so the static background cancels out and only
+the cells where the hands move remain, giving a fingerprint of FRAME_COUNT
+64-bit motion masks. Only the frames around those times are decoded. Re-encodes and re-takes of
+the same sign produce overlapping masks, so the distance between two clips
+is the Jaccard distance of their set bits.
+
+Lookup uses MinHash LSH: each fingerprint is stored with BAND_COUNT band
+keys, and any clip sharing a key is a candidate that is then checked
+exactly. Decoding needs PyAV; without it fingerprints are simply not
+computed and only exact content-hash reuse applies.
+"""
+import io
+
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import av
+except ImportError:  # pragma: no cover - optional dependency
+    av = None
+
+FRAME_COUNT = 16
+GRID = 8
+MOTION_THRESHOLD = 16      # grey levels a cell must differ from its average
+BAND_COUNT = 8
+ROWS_PER_BAND = 2
+SEEK_GAP = 1.0             # seconds; closer samples are decoded to, not seeked to
+
+_PRIME = (1 << 61) - 1
+# Fixed coefficients so band keys are stable across processes and deploys.
+_MINHASH = [
+    ((i + 1) * 0x9E3779B97F4A7C15 % _PRIME | 1, (i + 7) * 0xC2B2AE3D27D4EB4F % _PRIME)
+    for i in range(BAND_COUNT * ROWS_PER_BAND)
+]
+
+
+def _thumbnail(frame) -> bytes:
+    plane = frame.reformat(width=GRID, height=GRID, format='gray').planes[0]
+    raw, stride = bytes(plane), plane.line_size
+    return b''.join(raw[y * stride:y * stride + GRID] for y in range(GRID))
+
+
+def _targets(start: float, end: float) -> list[float]:
+    # Sample by timestamp, not index, so frame-rate changes don't shift the samples.
+    return [start + (end - start) * k / (FRAME_COUNT - 1) for k in range(FRAME_COUNT)]
+
+
+def _span(container, stream) -> tuple[float, float] | None:
+    """Times of the first and last frame as declared by the container, if it does."""
+    if stream.duration and stream.time_base:
+        duration = float(stream.duration * stream.time_base)
+    elif container.duration:
+        duration = container.duration / av.time_base
+    else:
+        return None
+    start = float(stream.start_time * stream.time_base) if stream.start_time else 0.0
+    rate = float(stream.average_rate or 0)
+    return start, start + max(0.0, duration - (1 / rate if rate else 0))
+
+
+def _sample_by_seeking(container, stream, start: float, end: float) -> list[bytes] | None:
+    """
+    Decode only around the sample times: seek to the keyframe before each
+    target and decode forward to it. Close targets are reached by decoding
+    on rather than seeking back. None if the stream lacks timestamps.
+    """
+    samples, frames, previous, current = [], None, None, None
+    for target in _targets(start, end):
+        if current is None or current.time + SEEK_GAP < target:
+            container.seek(int(target / stream.time_base), stream=stream)
+            frames, previous, current = container.decode(stream), None, None
+        while current is None or current.time < target:
+            frame = next(frames, None)
+            if frame is None:
+                break
+            if frame.time is None:
+                return None
+            previous, current = current, frame
+        if current is None:
+            return None
+        # The frame nearest the target, as _sample_by_decoding picks it.
+        if previous is not None and target - previous.time < current.time - target:
+            samples.append(_thumbnail(previous))
+        else:
+            samples.append(_thumbnail(current))
+    return samples
+
+
+def _sample_by_decoding(container, stream) -> list[bytes]:
+    """Decode every frame; for streams without a usable duration or timestamps."""
+    rate = float(stream.average_rate or 1)
+    thumbs = [
+        # Without timestamps, frames are assumed to be evenly spaced.
+        (frame.time if frame.time is not None else index / rate, _thumbnail(frame))
+        for index, frame in enumerate(container.decode(stream))
+    ]
+    if not thumbs:
+        return []
+    return [
+        min(thumbs, key=lambda t: abs(t[0] - target))[1]
+        for target in _targets(thumbs[0][0], thumbs[-1][0])
+    ]
+
+
+def _samples(video_bytes: bytes) -> list[bytes]:
+    """FRAME_COUNT evenly timed 8x8 grey thumbnails of the clip."""
+    with av.open(io.BytesIO(video_bytes)) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = 'AUTO'
+        span = _span(container, stream)
+        if span is not None:
+            try:
+                samples = _sample_by_seeking(container, stream, *span)
+            except av.FFmpegError:  # e.g. a container that can't seek
+                samples = None
+            if samples is not None:
+                return samples
+            container.seek(0)
+        return _sample_by_decoding(container, stream)
+
+
+def compute_fingerprint(video_bytes: bytes) -> list[int] | None:
+    """FRAME_COUNT 64-bit motion masks, or None if the clip can't be decoded."""
+    if av is None:
+        return None
+    try:
+        samples = _samples(video_bytes)
+    except (av.FFmpegError, IndexError, ValueError):
+        return None
+    if not samples:
+        return None
+
+    cells = GRID * GRID
+    average = [sum(pixels[i] for pixels in samples) / len(samples) for i in range(cells)]
+
+    masks = []
+    for pixels in samples:
+        mask = 0
+        for i in range(cells):
+            mask = (mask << 1) | (abs(pixels[i] - average[i]) > MOTION_THRESHOLD)
+        masks.append(mask)
+    return masks
+
+
+def distance(a: list[int], b: list[int], max_shift: int = 2) -> float:
+    """
+    Jaccard distance between the motion masks of two fingerprints, allowing
+    the clips to be offset by up to ``max_shift`` sampled frames.
+    """
+    best = 1.0
+    for shift in range(-max_shift, max_shift + 1):
+        pairs = [(a[i], b[i + shift]) for i in range(len(a)) if 0 <= i + shift < len(b)]
+        union = sum(bin(x | y).count('1') for x, y in pairs)
+        if not union:
+            continue
+        common = sum(bin(x & y).count('1') for x, y in pairs)
+        best = min(best, 1 - common / union)
+    return best
+
+
+def band_keys(masks: list[int]) -> list[int]:
+    """MinHash LSH keys; clips with similar motion share at least one key."""
+    elements = [
+        k * GRID * GRID + bit
+        for k, mask in enumerate(masks)
+        for bit in range(GRID * GRID) if mask >> bit & 1
+    ]
+    if not elements:
+        return []
+    minima = [min((a * x + b) % _PRIME for x in elements) for a, b in _MINHASH]
+    keys = []
+    for band in range(BAND_COUNT):
+        rows = minima[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        keys.append(band << 32 | _combine(rows))
+    return keys
+
+
+def _combine(rows: list[int]) -> int:
+    value = 0
+    for row in rows:
+        value = (value * 1_000_003 + row) % _PRIME
+    return value & 0xFFFFFFFF
+
+
+def encode(masks: list[int]) -> str:
+    return ''.join(f'{m:016x}' for m in masks)
+
+
+def decode(value: str) -> list[int]:
+    return [int(value[i:i + 16], 16) for i in range(0, len(value), 16)]
+
+
+# ── Lookup ───────────────────────────────────────────────────────
+
+def find_exact_analysis(content_hash: str, catalog_version: int):
+    """
+    Most recent successful analysis of the very same clip within
+    settings.FINGERPRINT_REUSE_WINDOW, or None. Only analyses matched against
+    ``catalog_version`` count: a sign added, edited or deleted since may
+    change the match.
+    """
+    from .models import Analysis
+
+    since = timezone.now() - settings.FINGERPRINT_REUSE_WINDOW
+    reusable = [Analysis.OUTCOME_MATCHED, Analysis.OUTCOME_UNMATCHED]
+    return (
+        Analysis.objects
+        .filter(content_hash=content_hash, outcome__in=reusable,
+                catalog_version=catalog_version, created_at__gte=since)
+        .order_by('-id').first()
+    )
+
+
+def find_similar_analysis(masks: list[int] | None, catalog_version: int):
+    """
+    Like find_exact_analysis, for the perceptually closest clip.
+    Returns (analysis, distance) or (None, None).
+    """
+    from .models import Analysis, VideoFingerprint
+
+    keys = band_keys(masks) if masks else []
+    if not keys:
+        return None, None
+
+    since = timezone.now() - settings.FINGERPRINT_REUSE_WINDOW
+    reusable = [Analysis.OUTCOME_MATCHED, Analysis.OUTCOME_UNMATCHED]
+    candidates = (
+        VideoFingerprint.objects
+        .filter(bands__key__in=keys, created_at__gte=since,
+                analysis__outcome__in=reusable,
+                analysis__catalog_version=catalog_version)
+        .distinct()
+        .select_related('analysis')
+        .order_by('-id')[:settings.FINGERPRINT_MAX_CANDIDATES]
+    )
+
+    best, best_distance = None, None
+    for candidate in candidates:
+        d = distance(masks, decode(candidate.masks))
+        if d <= settings.FINGERPRINT_MAX_DISTANCE and (best_distance is None or d < best_distance):
+            best, best_distance = candidate.analysis, d
+    return best, best_distance
+
+
+def store_fingerprint(analysis, masks: list[int]):
+    from .models import FingerprintBand, VideoFingerprint
+
+    fingerprint = VideoFingerprint.objects.create(analysis=analysis, masks=encode(masks))
+    FingerprintBand.objects.bulk_create(
+        FingerprintBand(fingerprint=fingerprint, key=key) for key in band_keys(masks)
+    )
@@ -0,0 +1,88 @@
+"""
+Persist every analysis and keep the daily rollups up to date.
+Shared by the HTTP views and the live WebSocket.
+
+Rollups are bumped in the same transaction as the raw row, so dashboards
+read the small per-day tables and never aggregate over Analysis itself.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+
+from .deadline import DeadlineExceeded
+from .models import Analysis, DailySchoolRollup, DailySignRollup
+from .upstream import CircuitOpenError
+
+FAILED_OUTCOMES = {
+    Analysis.OUTCOME_INVALID,
+    Analysis.OUTCOME_UPSTREAM_ERROR,
+    Analysis.OUTCOME_ERROR,
+}
+
+
+def success_outcome(analysis: dict) -> str:
+    return Analysis.OUTCOME_MATCHED if analysis.get('matched_sign') else Analysis.OUTCOME_UNMATCHED
+
+
+def failure_outcome(exc: Exception) -> tuple[str, int, str]:
+    """Map an analysis exception to (outcome, HTTP status, user-facing message)."""
+    if isinstance(exc, ValueError):
+        return Analysis.OUTCOME_INVALID, status.HTTP_400_BAD_REQUEST, str(exc)
+    if isinstance(exc, DeadlineExceeded):
+        return Analysis.OUTCOME_UPSTREAM_ERROR, status.HTTP_504_GATEWAY_TIMEOUT, str(exc)
+    if isinstance(exc, CircuitOpenError):
+        return Analysis.OUTCOME_UPSTREAM_ERROR, status.HTTP_503_SERVICE_UNAVAILABLE, str(exc)
+    if isinstance(exc, RuntimeError):
+        return Analysis.OUTCOME_UPSTREAM_ERROR, status.HTTP_502_BAD_GATEWAY, str(exc)
+    return Analysis.OUTCOME_ERROR, status.HTTP_500_INTERNAL_SERVER_ERROR, f'خطأ غير متوقع: {str(exc)}'
+
+
+def _bump(model, lookup: dict, **increments):
+    row, _ = model.objects.get_or_create(**lookup)
+    model.objects.filter(pk=row.pk).update(
+        **{field: F(field) + amount for field, amount in increments.items()}
+    )
+
+
+def record_analysis(user, content_hash: str, outcome: str, started: float,
+                    analysis: dict | None = None, error: str = '') -> Analysis:
+    """
+    Store one analysis attempt. ``started`` is the time.monotonic() value
+    taken when the request began; ``analysis`` is the analyze_video() result.
+    """
+    analysis = analysis or {}
+    timings = analysis.get('timings', {})
+    total_ms = round((time.monotonic() - started) * 1000)
+    matched_sign = analysis.get('matched_sign') or ''
+    school_name = getattr(user, 'school_name', '') or ''
+    day = timezone.localdate()
+
+    with transaction.atomic():
+        record = Analysis.objects.create(
+            user=user,
+            school_name=school_name,
+            content_hash=content_hash,
+            matched_sign=matched_sign,
+            outcome=outcome,
+            description=analysis.get('description', ''),
+            result=analysis.get('result', ''),
+            error=error,
+            reused_from_id=analysis.get('reused_from'),
+            reuse_distance=analysis.get('reuse_distance'),
+            catalog_version=analysis.get('catalog_version', 0),
+            describe_ms=timings.get('describe_ms'),
+            match_ms=timings.get('match_ms'),
+            total_ms=total_ms,
+        )
+        if matched_sign:
+            _bump(DailySignRollup, {'day': day, 'sign_name': matched_sign},
+                  count=1, total_ms=total_ms)
+        _bump(DailySchoolRollup, {'day': day, 'school_name': school_name},
+              count=1,
+              matched=int(outcome == Analysis.OUTCOME_MATCHED),
+              failed=int(outcome in FAILED_OUTCOMES),
+              total_ms=total_ms)
+    return record
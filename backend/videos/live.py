@@ -0,0 +1,327 @@
+"""
+Live recognition over a WebSocket.
+
+    ws(s)://<host>/ws/videos/live/?width=96&height=96&fps=10
+
+The app authenticates with ``Authorization: Bearer <access>`` (or
+``?token=``) and then streams binary messages, each one downscaled
+grayscale frame (the camera's Y plane, ``width * height`` bytes).
+
+The server keeps a short sliding window of frames per connection and
+splits the stream into motion segments: a segment starts when the hands
+move and ends once they rest. Each finished segment is encoded to MP4 and
+run through analyze_video, and the result is sent back as JSON:
+
+    {"type": "segment", "segment": 1, "frames": 23}                 # detected
+    {"type": "sign", "segment": 1, "matched_sign": "...", ...}      # recognized
+    {"type": "error", "segment": 1, "error": "...", "status": 502}
+    {"type": "dropped", "segment": 3}                               # overloaded
+
+Memory per connection is bounded: the window and segments are capped in
+frames, frames beyond the declared fps are discarded (a FrameBudget lets
+the bursts that follow a network stall through), and at most
+settings.LIVE_MAX_PENDING_SEGMENTS segments wait for recognition; newer
+segments are dropped rather than queued.
+"""
+import io
+import json
+import time
+import asyncio
+import hashlib
+import functools
+from collections import deque
+from urllib.parse import parse_qs, quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+
+from accounts.authentication import CachedJWTAuthentication
+from .deadline import Deadline
+from .history import failure_outcome, record_analysis, success_outcome
+from .models import Analysis
+from .utils import analyze_video, find_avatar
+
+try:
+    import av
+except ImportError:  # pragma: no cover - optional dependency
+    av = None
+
+LIVE_PATH = '/ws/videos/live/'
+
+MIN_DIMENSION = 64             # preflight rejects smaller videos
+MAX_DIMENSION = 160
+MAX_FPS = 15
+BURST_SECONDS = 2.0            # frames a client may send at once after a stall
+MOTION_SAMPLE_STEP = 4         # compare every 4th pixel
+MOTION_START = 6.0             # mean grey-level change that starts a segment
+MOTION_STOP = 3.0              # ...and below which the hands are resting
+PREROLL_SECONDS = 0.5          # frames kept from before the motion started
+REST_SECONDS = 0.6             # stillness that ends a segment
+MIN_SEGMENT_SECONDS = 0.6      # of motion; shorter ones are twitches, not signs
+MAX_SEGMENT_SECONDS = 6.0
+
+# WebSocket close codes (4000-4999 are application defined).
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_BAD_REQUEST = 4400
+CLOSE_NOT_FOUND = 4404
+
+
+class FrameBudget:
+    """
+    Token bucket admitting ``fps`` frames per second on average. Frames
+    delayed by the network arrive in bursts, so up to BURST_SECONDS worth
+    of frames saved up while idle pass at once.
+    """
+
+    def __init__(self, fps: float, now: float):
+        self.rate = fps
+        self.capacity = max(1.0, BURST_SECONDS * fps)
+        self.tokens = self.capacity
+        self.updated = now
+
+    def admit(self, now: float) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class MotionSegmenter:
+    """
+    Splits a stream of equally sized grayscale frames into motion segments.
+    ``feed`` returns the frames of a segment once it has finished.
+    """
+
+    def __init__(self, fps: float):
+        self.fps = fps
+        self.window = deque(maxlen=max(1, round(PREROLL_SECONDS * fps)))
+        self.segment = None
+        self.preroll = 0
+        self.still_frames = 0
+        self.previous = None
+
+    def _motion(self, frame: bytes) -> float:
+        if self.previous is None:
+            return 0.0
+        a, b = frame[::MOTION_SAMPLE_STEP], self.previous[::MOTION_SAMPLE_STEP]
+        return sum(abs(x - y) for x, y in zip(a, b)) / len(a)
+
+    def feed(self, frame: bytes) -> list[bytes] | None:
+        motion = self._motion(frame)
+        self.previous = frame
+
+        if self.segment is None:
+            if motion >= MOTION_START:
+                self.segment = list(self.window) + [frame]
+                self.preroll = len(self.window)
+                self.still_frames = 0
+                self.window.clear()
+            else:
+                self.window.append(frame)
+            return None
+
+        self.segment.append(frame)
+        self.still_frames = self.still_frames + 1 if motion < MOTION_STOP else 0
+        resting = self.still_frames >= REST_SECONDS * self.fps
+        if not resting and len(self.segment) < MAX_SEGMENT_SECONDS * self.fps:
+            return None
+
+        segment, self.segment = self.segment, None
+        # Judge a twitch by its motion alone, without the preroll and the rest.
+        if len(segment) - self.preroll - self.still_frames < MIN_SEGMENT_SECONDS * self.fps:
+            return None
+        return segment
+
+
+def encode_segment(frames: list[bytes], width: int, height: int, fps: int) -> bytes:
+    """Encode grayscale frames as a small MPEG-4 video for the describe step."""
+    buffer = io.BytesIO()
+    with av.open(buffer, mode='w', format='mp4') as container:
+        stream = container.add_stream('mpeg4', rate=fps)
+        stream.width, stream.height = width, height
+        stream.pix_fmt = 'yuv420p'
+        for raw in frames:
+            frame = av.VideoFrame(width, height, 'gray')
+            plane = frame.planes[0]
+            if plane.line_size == width:
+                plane.update(raw)
+            else:
+                padding = bytes(plane.line_size - width)
+                plane.update(b''.join(
+                    raw[y * width:(y + 1) * width] + padding for y in range(height)
+                ))
+            container.mux(stream.encode(frame))
+        container.mux(stream.encode())
+    return buffer.getvalue()
+
+
+def _headers(scope) -> dict[str, str]:
+    return {k.decode('latin1').lower(): v.decode('latin1') for k, v in scope.get('headers', [])}
+
+
+def _database_work(func):
+    """
+    Close stale or expired connections around ``func``, as Django does around
+    each request. This handler runs outside the request cycle, and the worker
+    threads would otherwise keep their connections open indefinitely.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+@_database_work
+def _authenticate(scope, params):
+    """The connecting user, or None. Runs in a worker thread (database access)."""
+    auth = CachedJWTAuthentication()
+    header = _headers(scope).get('authorization', '')
+    raw = auth.get_raw_token(header.encode('latin1')) if header else None
+    if raw is None and params.get('token'):
+        raw = params['token'][0].encode('latin1')
+    if raw is None:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (AuthenticationFailed, TokenError):
+        return None
+
+
+@_database_work
+def _recognize(user, video_bytes: bytes, base_url: str) -> dict:
+    """Analyze one segment and record it in the history, like analyze_view."""
+    started = time.monotonic()
+    content_hash = hashlib.sha256(video_bytes).hexdigest()
+    deadline = Deadline(settings.LIVE_SEGMENT_DEADLINE_SECONDS)
+    analysis, error = None, ''
+    try:
+        analysis = analyze_video(video_bytes, 'live.mp4', deadline=deadline)
+        outcome = success_outcome(analysis)
+        avatar_filename = find_avatar(analysis.get('matched_sign'))
+        message = {
+            'type': 'sign',
+            'matched_sign': analysis.get('matched_sign'),
+            'result': analysis['result'],
+            'description': analysis['description'],
+            'avatar_url': f'{base_url}/media/avatars/{quote(avatar_filename)}' if avatar_filename else None,
+        }
+    except Exception as e:
+        outcome, http_status, error = failure_outcome(e)
+        message = {'type': 'error', 'error': error, 'status': http_status}
+
+    record = record_analysis(user, content_hash, outcome, started, analysis, error)
+    if outcome in (Analysis.OUTCOME_MATCHED, Analysis.OUTCOME_UNMATCHED):
+        message['analysis_id'] = record.pk
+    return message
+
+
+class LiveSession:
+    def __init__(self, scope, receive, send):
+        self.scope, self.receive, self.send = scope, receive, send
+        self.pending: set[asyncio.Task] = set()
+        self.send_lock = asyncio.Lock()
+        self.segments = 0
+
+    async def send_json(self, message: dict):
+        async with self.send_lock:
+            await self.send({'type': 'websocket.send', 'text': json.dumps(message, ensure_ascii=False)})
+
+    async def close(self, code: int):
+        await self.send({'type': 'websocket.close', 'code': code})
+
+    def _config(self, params):
+        try:
+            width = int(params.get('width', ['96'])[0])
+            height = int(params.get('height', ['96'])[0])
+            fps = int(params.get('fps', ['10'])[0])
+        except ValueError:
+            return None
+        if not (MIN_DIMENSION <= width <= MAX_DIMENSION and MIN_DIMENSION <= height <= MAX_DIMENSION):
+            return None
+        if width % 2 or height % 2 or not 1 <= fps <= MAX_FPS:
+            return None
+        return width, height, fps
+
+    def _base_url(self) -> str:
+        scheme = 'https' if self.scope.get('scheme') == 'wss' else 'http'
+        host = _headers(self.scope).get('host', '')
+        return f'{scheme}://{host}' if host else ''
+
+    async def run(self):
+        if (await self.receive())['type'] != 'websocket.connect':
+            return
+        params = parse_qs(self.scope.get('query_string', b'').decode('latin1'))
+
+        user = await sync_to_async(_authenticate)(self.scope, params)
+        if user is None:
+            return await self.close(CLOSE_UNAUTHORIZED)
+        config = self._config(params)
+        if config is None or av is None:
+            return await self.close(CLOSE_BAD_REQUEST)
+        width, height, fps = config
+
+        await self.send({'type': 'websocket.accept'})
+        segmenter = MotionSegmenter(fps)
+        budget = FrameBudget(fps, time.monotonic())
+        frame_size = width * height
+
+        try:
+            while True:
+                message = await self.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                frame = message.get('bytes')
+                if frame is None:
+                    continue  # text messages are reserved for future control commands
+                if len(frame) != frame_size:
+                    await self.close(CLOSE_BAD_REQUEST)
+                    break
+                if not budget.admit(time.monotonic()):
+                    continue
+
+                segment = segmenter.feed(frame)
+                if segment is not None:
+                    await self._dispatch(user, segment, width, height, fps)
+        finally:
+            for task in self.pending:
+                task.cancel()
+
+    async def _dispatch(self, user, frames, width, height, fps):
+        self.segments += 1
+        number = self.segments
+        if len(self.pending) >= settings.LIVE_MAX_PENDING_SEGMENTS:
+            await self.send_json({'type': 'dropped', 'segment': number})
+            return
+        await self.send_json({'type': 'segment', 'segment': number, 'frames': len(frames)})
+
+        async def recognize():
+            try:
+                video = await sync_to_async(encode_segment, thread_sensitive=False)(frames, width, height, fps)
+                result = await sync_to_async(_recognize, thread_sensitive=False)(user, video, self._base_url())
+            except Exception as e:
+                # e.g. the history write failed; the client still gets an answer.
+                _, http_status, error = failure_outcome(e)
+                result = {'type': 'error', 'error': error, 'status': http_status}
+            await self.send_json({**result, 'segment': number})
+
+        task = asyncio.create_task(recognize())
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+
+async def live_recognition(scope, receive, send):
+    """ASGI handler for WebSocket connections."""
+    if scope['path'] != LIVE_PATH:
+        await receive()
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    await LiveSession(scope, receive, send).run()
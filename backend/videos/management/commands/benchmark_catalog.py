@@ -0,0 +1,142 @@
+"""
+Time the catalog-sensitive code paths as the sign catalog grows.
+
+Synthetic signs are added inside a transaction that is rolled back at the
+end, and sign_descriptions.json is redirected to a temporary file, so the
+database and the reference file are left exactly as they were.
+
+match_description runs against an instant fake upstream by default: what
+is measured is the local cost of building the prompt, plus its size,
+which is what drives upstream latency. --live sends the prompts for real.
+"""
+import json
+import random
+import tempfile
+import statistics
+import time
+from pathlib import Path
+from unittest import mock
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+from videos import utils
+from videos.models import SignAvatar
+from videos.synthetic import create_signs, next_index, synthetic_description, synthetic_name
+from videos.views import AVATARS_PER_PAGE, avatar_list
+
+DEFAULT_SIZES = '100,1000,10000'
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _instant_upstream(stage: str, body: dict, timeout: float) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = json.dumps({
+        'choices': [{'message': {'content': 'الإشارة: غير معروفة\nالتوضيح: -'}}],
+    }).encode('utf-8')
+    resp.encoding = 'utf-8'
+    return resp
+
+
+class Command(BaseCommand):
+    help = 'Benchmark match_description, rebuild_descriptions_json, avatar_list and find_avatar by catalog size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma-separated catalog sizes')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (median is reported)')
+        parser.add_argument('--live', action='store_true', help='Call the real upstream for match_description')
+        parser.add_argument('--json', dest='json_path', help='Also write the results here')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(s) for s in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes must be comma-separated integers')
+        self.repeat = max(1, options['repeat'])
+        self.factory = RequestFactory()
+        self.last_index = 0
+
+        transport = utils.transport if options['live'] else _instant_upstream
+        results = []
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(utils, 'DESCRIPTIONS_PATH', Path(tmp) / 'sign_descriptions.json'), \
+                mock.patch.object(utils, 'transport', transport):
+            try:
+                with transaction.atomic():
+                    total = SignAvatar.objects.count()
+                    for size in sizes:
+                        if size > total:
+                            self.last_index = next_index() + size - total - 1
+                            create_signs(size - total, start=next_index(), write_files=False)
+                            total = size
+                        results.append(self._measure(total))
+                        self._print(results[-1])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+    def _time(self, fn) -> float:
+        runs = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            fn()
+            runs.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(runs), 2)
+
+    def _measure(self, size: int) -> dict:
+        rebuild_ms = self._time(utils.rebuild_descriptions_json)
+
+        prompt_chars = 0
+
+        def match():
+            original = utils.transport
+
+            def sized(stage, body, timeout):
+                nonlocal prompt_chars
+                prompt_chars = sum(len(m['content']) for m in body['messages'])
+                return original(stage, body, timeout)
+
+            with mock.patch.object(utils, 'transport', sized):
+                utils.match_description(synthetic_description(random.Random(size)))
+
+        match_ms = self._time(match)
+
+        # The newest synthetic sign, looked up by name like after a match.
+        last_name = synthetic_name(self.last_index)
+        find_ms = self._time(lambda: utils.find_avatar(last_name))
+
+        list_first_ms = self._time(lambda: avatar_list(self.factory.get('/admin-panel/avatars/')))
+        last_page = max(1, -(-size // AVATARS_PER_PAGE))
+        list_last_ms = self._time(
+            lambda: avatar_list(self.factory.get('/admin-panel/avatars/', {'page': last_page}))
+        )
+        list_search_ms = self._time(
+            lambda: avatar_list(self.factory.get('/admin-panel/avatars/', {'q': 'المعصم'}))
+        )
+
+        return {
+            'signs': size,
+            'rebuild_descriptions_json_ms': rebuild_ms,
+            'match_description_ms': match_ms,
+            'match_prompt_chars': prompt_chars,
+            'find_avatar_ms': find_ms,
+            'avatar_list_first_page_ms': list_first_ms,
+            'avatar_list_last_page_ms': list_last_ms,
+            'avatar_list_search_ms': list_search_ms,
+        }
+
+    def _print(self, row: dict):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{row["signs"]} signs'))
+        for key, value in row.items():
+            if key != 'signs':
+                self.stdout.write(f'  {key:<30} {value}')
@@ -0,0 +1,183 @@
+"""
+Run a labeled set of clips through analyze_video and report accuracy and
+latency, replaying recorded upstream responses so runs are offline and
+repeatable.
+
+The labeled set is either a JSON manifest ``[{"path": "...", "label": "..."}]``
+(paths relative to the manifest) or a directory laid out as ``<label>/<clip>``.
+"""
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from videos.cassette import MODES, Cassette
+from videos.utils import _load_reference_descriptions, analyze_video
+
+VIDEO_SUFFIXES = {'.mp4', '.mov', '.webm', '.mkv', '.avi', '.ogg'}
+DEFAULT_DIR = Path(settings.BASE_DIR) / 'eval'
+
+
+def load_labeled_set(source: Path) -> list[tuple[Path, str]]:
+    if source.is_file():
+        with open(source, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        return [(source.parent / e['path'], e['label']) for e in entries]
+    clips = []
+    for label_dir in sorted(p for p in source.iterdir() if p.is_dir()):
+        for clip in sorted(label_dir.iterdir()):
+            if clip.suffix.lower() in VIDEO_SUFFIXES:
+                clips.append((clip, label_dir.name))
+    return clips
+
+
+def ranked_signs(analysis: dict, names: list[str]) -> list[str]:
+    """
+    Candidates in the order step 2 mentions them, with the chosen sign first.
+    The matcher only names one winner, so this is how top-k is approximated.
+    """
+    text = analysis.get('result', '')
+    mentioned = sorted((text.find(n), n) for n in names if n in text)
+    ranked = [n for _, n in mentioned]
+    matched = analysis.get('matched_sign')
+    if matched:
+        ranked = [matched] + [n for n in ranked if n != matched]
+    return ranked
+
+
+def _percentile(values: list[int], pct: float) -> int | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Evaluate sign recognition accuracy and latency against a labeled clip set'
+
+    def add_arguments(self, parser):
+        parser.add_argument('labeled_set', help='Manifest JSON file or <label>/<clip> directory')
+        parser.add_argument('--mode', choices=MODES, default='replay',
+                            help='replay (offline, default), record, or auto (record only misses)')
+        parser.add_argument('--cassettes', default=str(DEFAULT_DIR / 'cassettes'),
+                            help='Directory holding recorded upstream responses')
+        parser.add_argument('--top-k', type=int, default=3)
+        parser.add_argument('--baseline', default=str(DEFAULT_DIR / 'baseline.json'),
+                            help='Metrics file to compare against')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Overwrite the baseline with this run')
+        parser.add_argument('--json', dest='json_path', help='Also write the full report here')
+
+    def handle(self, *args, **options):
+        source = Path(options['labeled_set'])
+        if not source.exists():
+            raise CommandError(f'{source} not found')
+        clips = load_labeled_set(source)
+        if not clips:
+            raise CommandError('No labeled clips found')
+
+        cassette = Cassette(Path(options['cassettes']), options['mode'])
+        names = list(_load_reference_descriptions())
+        top_k = options['top_k']
+
+        # Hedging would make replays depend on timing; always use the primary.
+        overrides = {'ANALYSIS_HEDGE_MIN_SAMPLES': 10 ** 9} if options['mode'] == 'replay' else {}
+
+        results = []
+        with cassette.installed(), override_settings(**overrides):
+            for path, label in clips:
+                row = {'clip': str(path), 'label': label, 'ranked': [], 'error': None}
+                try:
+                    analysis = analyze_video(path.read_bytes(), path.name)
+                    row['ranked'] = ranked_signs(analysis, names)
+                except (ValueError, RuntimeError) as e:
+                    row['error'] = str(e)
+                row['events'] = cassette.take_events()
+                results.append(row)
+                predicted = row['ranked'][0] if row['ranked'] else '—'
+                mark = '✓' if predicted == label else '✗'
+                self.stdout.write(f'{mark} {label} → {predicted}' + (f'  [{row["error"]}]' if row['error'] else ''))
+
+        metrics = self._metrics(results, top_k)
+        self._report(metrics, top_k)
+
+        baseline_path = Path(options['baseline'])
+        if baseline_path.exists() and not options['save_baseline']:
+            with open(baseline_path, 'r', encoding='utf-8') as f:
+                self._compare(metrics, json.load(f))
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(baseline_path, 'w', encoding='utf-8') as f:
+                json.dump(metrics, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {baseline_path}'))
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump({'metrics': metrics, 'results': results}, f, ensure_ascii=False, indent=2)
+
+    def _metrics(self, results: list[dict], top_k: int) -> dict:
+        total = len(results)
+        top1 = sum(1 for r in results if r['ranked'][:1] == [r['label']])
+        topk = sum(1 for r in results if r['label'] in r['ranked'][:top_k])
+        confusion = Counter(
+            (r['label'], r['ranked'][0] if r['ranked'] else None)
+            for r in results if r['ranked'][:1] != [r['label']]
+        )
+
+        latencies, tokens = defaultdict(list), defaultdict(int)
+        for r in results:
+            for event in r['events']:
+                latencies[event['stage']].append(event['latency_ms'])
+                tokens[event['stage']] += event['usage'].get('total_tokens', 0)
+
+        return {
+            'clips': total,
+            'errors': sum(1 for r in results if r['error']),
+            'top1': top1 / total,
+            'topk': topk / total,
+            'confusion': [
+                {'label': label, 'predicted': predicted, 'count': count}
+                for (label, predicted), count in confusion.most_common()
+            ],
+            'latency_ms': {
+                stage: {'p50': _percentile(values, 50), 'p95': _percentile(values, 95)}
+                for stage, values in sorted(latencies.items())
+            },
+            'tokens': dict(sorted(tokens.items())),
+        }
+
+    def _report(self, metrics: dict, top_k: int):
+        self.stdout.write('')
+        self.stdout.write(f'Clips: {metrics["clips"]}  errors: {metrics["errors"]}')
+        self.stdout.write(f'Top-1 accuracy: {metrics["top1"]:.1%}')
+        self.stdout.write(f'Top-{top_k} accuracy: {metrics["topk"]:.1%}')
+        for stage, lat in metrics['latency_ms'].items():
+            self.stdout.write(
+                f'{stage:>9}: p50 {lat["p50"]} ms, p95 {lat["p95"]} ms, '
+                f'{metrics["tokens"].get(stage, 0)} tokens'
+            )
+        if metrics['confusion']:
+            self.stdout.write('Most confused:')
+            for pair in metrics['confusion'][:10]:
+                self.stdout.write(f'  {pair["label"]} → {pair["predicted"] or "—"} ×{pair["count"]}')
+
+    def _compare(self, metrics: dict, baseline: dict):
+        self.stdout.write('')
+        self.stdout.write('Compared with baseline:')
+        for key in ('top1', 'topk'):
+            delta = metrics[key] - baseline.get(key, 0)
+            style = self.style.SUCCESS if delta >= 0 else self.style.ERROR
+            self.stdout.write(style(f'  {key}: {metrics[key]:.1%} ({delta:+.1%})'))
+        for stage, lat in metrics['latency_ms'].items():
+            before = baseline.get('latency_ms', {}).get(stage, {})
+            for pct in ('p50', 'p95'):
+                if lat[pct] is not None and before.get(pct) is not None:
+                    delta = lat[pct] - before[pct]
+                    style = self.style.SUCCESS if delta <= 0 else self.style.WARNING
+                    self.stdout.write(style(f'  {stage} {pct}: {lat[pct]} ms ({delta:+d} ms)'))
+        for stage, count in metrics['tokens'].items():
+            before = baseline.get('tokens', {}).get(stage)
+            if before is not None:
+                self.stdout.write(f'  {stage} tokens: {count} ({count - before:+d})')
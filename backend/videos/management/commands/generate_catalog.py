@@ -0,0 +1,83 @@
+"""
+Fill the database with synthetic signs and student accounts for scale
+testing. Everything created here can be removed again with --clear.
+"""
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from videos.synthetic import create_signs, delete_signs, next_index
+from videos.utils import rebuild_descriptions_json
+
+USERNAME_PREFIX = 'synthetic_'
+SCHOOL_KINDS = ['مدرسة', 'معهد', 'مركز']
+SCHOOL_NAMES = ['النور', 'الأمل', 'الرواد', 'المستقبل', 'الفجر', 'الإبداع', 'الهدى', 'التميز']
+FIRST_NAMES = ['أحمد', 'محمد', 'سارة', 'فاطمة', 'عمر', 'ليلى', 'يوسف', 'مريم', 'خالد', 'نور']
+LAST_NAMES = ['العلي', 'الحسن', 'القحطاني', 'الشمري', 'الزهراني', 'المطيري', 'الدوسري', 'العتيبي']
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic signs and student accounts for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--signs', type=int, default=1000, help='Synthetic signs to add')
+        parser.add_argument('--users', type=int, default=0, help='Synthetic students to add')
+        parser.add_argument('--schools', type=int, default=50, help='Schools to spread students across')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='student123', help='Password for every synthetic student')
+        parser.add_argument('--rebuild-json', action='store_true',
+                            help='Rebuild sign_descriptions.json so matching sees the new signs')
+        parser.add_argument('--clear', action='store_true',
+                            help='Remove all synthetic signs and students instead')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            signs = delete_signs()
+            synthetic_users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+            users = synthetic_users.count()
+            synthetic_users.delete()
+            self.stdout.write(self.style.SUCCESS(f'Removed {signs} signs and {users} users'))
+            if options['rebuild_json']:
+                rebuild_descriptions_json()
+            return
+
+        # Batches commit one by one; what a failed run leaves is removed by --clear.
+        signs = create_signs(options['signs'], start=next_index(), seed=options['seed'])
+        self.stdout.write(self.style.SUCCESS(f'Created {signs} signs'))
+
+        if options['users']:
+            users = self._create_users(options['users'], options['schools'], options['seed'], options['password'])
+            self.stdout.write(self.style.SUCCESS(f'Created {users} users across {options["schools"]} schools'))
+
+        if options['rebuild_json']:
+            rebuild_descriptions_json()
+            self.stdout.write('Rebuilt sign_descriptions.json')
+
+    def _create_users(self, count: int, schools: int, seed: int, password: str) -> int:
+        rng = random.Random(seed)
+        school_names = [
+            f'{SCHOOL_KINDS[i % len(SCHOOL_KINDS)]} {SCHOOL_NAMES[i % len(SCHOOL_NAMES)]} {i + 1}'
+            for i in range(max(1, schools))
+        ]
+        # Hashing is deliberately slow; every synthetic student shares one hash.
+        hashed = make_password(password)
+        last = (
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by('-username').values_list('username', flat=True).first()
+        )
+        start = int(last[len(USERNAME_PREFIX):]) + 1 if last else 0
+
+        users = [
+            User(
+                username=f'{USERNAME_PREFIX}{start + i:06d}',
+                password=hashed,
+                role='student',
+                full_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                school_name=rng.choice(school_names),
+            )
+            for i in range(count)
+        ]
+        User.objects.bulk_create(users, batch_size=1000)
+        return len(users)
@@ -0,0 +1,69 @@
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'videos_signavatar_fts'
+
+CREATE_FTS = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, description, content='videos_signavatar', content_rowid='id'
+    )""",
+    f"""CREATE TRIGGER videos_signavatar_fts_ai AFTER INSERT ON videos_signavatar BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER videos_signavatar_fts_ad AFTER DELETE ON videos_signavatar BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER videos_signavatar_fts_au AFTER UPDATE ON videos_signavatar BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_FTS = [
+    'DROP TRIGGER IF EXISTS videos_signavatar_fts_ai',
+    'DROP TRIGGER IF EXISTS videos_signavatar_fts_ad',
+    'DROP TRIGGER IF EXISTS videos_signavatar_fts_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+            cursor.execute('DROP TABLE temp.fts5_probe')
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to icontains.
+            return
+        for statement in CREATE_FTS:
+            cursor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in DROP_FTS:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='signavatar',
+            index=models.Index(fields=['-created_at'], name='signavatar_created_idx'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0002_signavatar_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySchoolRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('school_name', models.CharField(max_length=200)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('matched', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day', 'school_name'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'school_name'), name='unique_school_rollup_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySignRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sign_name', models.CharField(max_length=200)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day', '-count'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'sign_name'), name='unique_sign_rollup_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Analysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('school_name', models.CharField(blank=True, max_length=200)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('matched_sign', models.CharField(blank=True, max_length=200)),
+                ('outcome', models.CharField(choices=[('matched', 'تمت المطابقة'), ('unmatched', 'لم تتم المطابقة'), ('invalid', 'ملف غير صالح'), ('upstream_error', 'خطأ من خدمة التحليل'), ('error', 'خطأ غير متوقع')], max_length=20)),
+                ('description', models.TextField(blank=True)),
+                ('result', models.TextField(blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('describe_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('match_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('total_ms', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analyses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'تحليل',
+                'verbose_name_plural': 'التحليلات',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['user', '-id'], name='analysis_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:51
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_catalog(apps, schema_editor):
+    SignAvatar = apps.get_model('videos', 'SignAvatar')
+    CatalogChange = apps.get_model('videos', 'CatalogChange')
+    for avatar in SignAvatar.objects.order_by('created_at'):
+        if avatar.video:
+            try:
+                digest = hashlib.sha256()
+                with avatar.video.open('rb') as f:
+                    for chunk in f.chunks():
+                        digest.update(chunk)
+                avatar.content_hash = digest.hexdigest()
+                avatar.size = avatar.video.size
+            except OSError:
+                pass
+        avatar.version = CatalogChange.objects.create(name=avatar.name).pk
+        avatar.save(update_fields=['content_hash', 'size', 'version'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0004_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='signavatar',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='signavatar',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='signavatar',
+            name='version',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_catalog, migrations.RunPython.noop),
+    ]
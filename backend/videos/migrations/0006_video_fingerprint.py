@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0005_signavatar_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysis',
+            name='reuse_distance',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysis',
+            name='reused_from',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reuses', to='videos.analysis'),
+        ),
+        migrations.CreateModel(
+            name='VideoFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('masks', models.CharField(max_length=256)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('analysis', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint', to='videos.analysis')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FingerprintBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('fingerprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='videos.videofingerprint')),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+FTS_TABLE = 'videos_signavatar_fts'
+
+# The triggers as created in 0002, copied so this migration never changes.
+RESTORE_FTS = [
+    'DROP TRIGGER IF EXISTS videos_signavatar_fts_ai',
+    'DROP TRIGGER IF EXISTS videos_signavatar_fts_ad',
+    'DROP TRIGGER IF EXISTS videos_signavatar_fts_au',
+    f"""CREATE TRIGGER videos_signavatar_fts_ai AFTER INSERT ON videos_signavatar BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER videos_signavatar_fts_ad AFTER DELETE ON videos_signavatar BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER videos_signavatar_fts_au AFTER UPDATE ON videos_signavatar BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def restore_fts_triggers(apps, schema_editor):
+    # 0005 rebuilt videos_signavatar to add columns, which on SQLite drops
+    # the FTS sync triggers created in 0002. Recreate them and reindex.
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+        return  # no FTS5 index: search falls back to icontains
+    with connection.cursor() as cursor:
+        for statement in RESTORE_FTS:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0006_video_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0007_restore_signavatar_fts_triggers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysis',
+            name='catalog_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
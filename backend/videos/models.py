@@ -1,16 +1,165 @@
-from django.db import models
+import uuid
+
+from django.conf import settings
+from django.db import models, transaction
 
 
 class SignAvatar(models.Model):
     name = models.CharField(max_length=200, unique=True, verbose_name='اسم الإشارة')
     video = models.FileField(upload_to='avatars/', verbose_name='فيديو الأفاتار')
     description = models.TextField(blank=True, verbose_name='وصف الحركات')
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    size = models.PositiveBigIntegerField(default=0, editable=False)
+    # Catalog version of the last change to this sign (see CatalogChange).
+    version = models.PositiveBigIntegerField(default=0, db_index=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['-created_at'], name='signavatar_created_idx')]
         verbose_name = 'إشارة أفاتار'
         verbose_name_plural = 'إشارات الأفاتار'
 
     def __str__(self):
         return self.name
+
+    # The catalog signals write a CatalogChange row; it must commit together
+    # with the sign, or a sync in between sees a version without its sign.
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+
+class CatalogChange(models.Model):
+    """
+    Append-only log of catalog edits. The id of the newest row is the
+    catalog version; deleted signs stay here as tombstones for delta syncs.
+    """
+
+    name = models.CharField(max_length=200)
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def current_version(cls) -> int:
+        return cls.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+class Analysis(models.Model):
+    OUTCOME_MATCHED = 'matched'
+    OUTCOME_UNMATCHED = 'unmatched'
+    OUTCOME_INVALID = 'invalid'
+    OUTCOME_UPSTREAM_ERROR = 'upstream_error'
+    OUTCOME_ERROR = 'error'
+    OUTCOME_CHOICES = [
+        (OUTCOME_MATCHED, 'تمت المطابقة'),
+        (OUTCOME_UNMATCHED, 'لم تتم المطابقة'),
+        (OUTCOME_INVALID, 'ملف غير صالح'),
+        (OUTCOME_UPSTREAM_ERROR, 'خطأ من خدمة التحليل'),
+        (OUTCOME_ERROR, 'خطأ غير متوقع'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='analyses',
+    )
+    school_name = models.CharField(max_length=200, blank=True)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    matched_sign = models.CharField(max_length=200, blank=True)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    description = models.TextField(blank=True)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    reused_from = models.ForeignKey(
+        'self', null=True, blank=True, on_delete=models.SET_NULL, related_name='reuses',
+    )
+    reuse_distance = models.FloatField(null=True, blank=True)
+    # Catalog version the match was made against; reuse requires it unchanged.
+    catalog_version = models.PositiveBigIntegerField(default=0)
+    describe_ms = models.PositiveIntegerField(null=True, blank=True)
+    match_ms = models.PositiveIntegerField(null=True, blank=True)
+    total_ms = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [models.Index(fields=['user', '-id'], name='analysis_user_idx')]
+        verbose_name = 'تحليل'
+        verbose_name_plural = 'التحليلات'
+
+    def __str__(self):
+        return f'{self.user} – {self.matched_sign or self.outcome}'
+
+
+class VideoFingerprint(models.Model):
+    """Perceptual fingerprint of an analyzed clip (see videos.fingerprint)."""
+
+    analysis = models.OneToOneField(Analysis, on_delete=models.CASCADE, related_name='fingerprint')
+    masks = models.CharField(max_length=256)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class FingerprintBand(models.Model):
+    """One MinHash LSH band key of a fingerprint; the lookup index."""
+
+    fingerprint = models.ForeignKey(VideoFingerprint, on_delete=models.CASCADE, related_name='bands')
+    key = models.BigIntegerField(db_index=True)
+
+
+class DailySignRollup(models.Model):
+    day = models.DateField()
+    sign_name = models.CharField(max_length=200)
+    count = models.PositiveIntegerField(default=0)
+    total_ms = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', '-count']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'sign_name'], name='unique_sign_rollup_day'),
+        ]
+
+
+class DailySchoolRollup(models.Model):
+    day = models.DateField()
+    school_name = models.CharField(max_length=200)
+    count = models.PositiveIntegerField(default=0)
+    matched = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    total_ms = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', 'school_name']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'school_name'], name='unique_school_rollup_day'),
+        ]
+
+
+class ChunkedUpload(models.Model):
+    """A resumable upload in progress; bytes are assembled in ``path`` on disk."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chunked_uploads',
+    )
+    filename = models.CharField(max_length=255)
+    length = models.PositiveIntegerField()
+    offset = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def path(self):
+        return settings.CHUNKED_UPLOAD_DIR / f'{self.id}.part'
+
+    @property
+    def is_complete(self) -> bool:
+        return self.offset == self.length
+
+    def discard(self):
+        self.path.unlink(missing_ok=True)
+        self.delete()
@@ -0,0 +1,355 @@
+"""
+Local preflight checks for uploaded videos.
+
+Parses just enough of the container header (MP4/MOV, WebM/MKV, AVI, Ogg)
+to learn the duration, resolution, codec and whether a video track exists,
+so that bad uploads are rejected before any upstream call is made.
+"""
+import struct
+from dataclasses import dataclass
+
+MAX_DURATION_SECONDS = 60
+MIN_DURATION_SECONDS = 0.3
+MIN_VIDEO_DIMENSION = 64
+
+SUPPORTED_CODECS = {"h264", "hevc", "mpeg4", "vp8", "vp9", "av1", "theora"}
+
+# ISO BMFF sample-entry / Matroska CodecID / AVI FourCC → canonical name
+_CODEC_NAMES = {
+    "avc1": "h264", "avc3": "h264", "h264": "h264", "x264": "h264",
+    "hvc1": "hevc", "hev1": "hevc", "h265": "hevc", "hevc": "hevc",
+    "mp4v": "mpeg4", "xvid": "mpeg4", "divx": "mpeg4", "fmp4": "mpeg4", "dx50": "mpeg4",
+    "vp08": "vp8", "vp80": "vp8", "vp09": "vp9", "vp90": "vp9", "av01": "av1",
+    "V_MPEG4/ISO/AVC": "h264", "V_MPEGH/ISO/HEVC": "hevc", "V_MPEG4/ISO/ASP": "mpeg4",
+    "V_VP8": "vp8", "V_VP9": "vp9", "V_AV1": "av1", "V_THEORA": "theora",
+}
+
+_CONTAINER_MIME = {
+    "mp4": "video/mp4",
+    "mov": "video/quicktime",
+    "webm": "video/webm",
+    "mkv": "video/x-matroska",
+    "avi": "video/x-msvideo",
+    "ogg": "video/ogg",
+}
+
+
+@dataclass
+class VideoInfo:
+    container: str
+    has_video: bool = False
+    duration: float | None = None
+    width: int | None = None
+    height: int | None = None
+    codec: str | None = None
+
+    @property
+    def mime(self) -> str:
+        return _CONTAINER_MIME[self.container]
+
+
+class _Truncated(Exception):
+    pass
+
+
+def _codec_name(tag: str) -> str:
+    return _CODEC_NAMES.get(tag) or _CODEC_NAMES.get(tag.lower()) or tag
+
+
+# ── ISO BMFF (MP4 / MOV) ─────────────────────────────────────────
+
+def _iter_boxes(data: bytes, start: int, end: int):
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise _Truncated
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise ValueError("bad box size")
+        if pos + size > end:
+            raise _Truncated
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _find_box(data: bytes, start: int, end: int, kind: bytes):
+    for k, s, e in _iter_boxes(data, start, end):
+        if k == kind:
+            return s, e
+    return None
+
+
+def _probe_isobmff(data: bytes) -> VideoInfo:
+    info = VideoInfo(container="mp4")
+    moov = None
+    for kind, start, end in _iter_boxes(data, 0, len(data)):
+        if kind == b"ftyp" and data[start:start + 4] == b"qt  ":
+            info.container = "mov"
+        elif kind == b"moov":
+            moov = (start, end)
+    if moov is None:
+        raise _Truncated
+
+    mvhd = _find_box(data, *moov, b"mvhd")
+    if mvhd:
+        s = mvhd[0]
+        if data[s] == 1:
+            timescale, duration = struct.unpack_from(">IQ", data, s + 20)
+        else:
+            timescale, duration = struct.unpack_from(">II", data, s + 12)
+        # Fragmented files leave mvhd empty; the total, if known, is in mvex/mehd.
+        mvex = _find_box(data, *moov, b"mvex")
+        mehd = mvex and _find_box(data, *mvex, b"mehd")
+        if not duration and mehd:
+            fmt = ">Q" if data[mehd[0]] == 1 else ">I"
+            duration = struct.unpack_from(fmt, data, mehd[0] + 4)[0]
+        # Zero means "not declared", not an empty clip.
+        if timescale and duration:
+            info.duration = duration / timescale
+
+    for kind, start, end in _iter_boxes(data, *moov):
+        if kind != b"trak":
+            continue
+        mdia = _find_box(data, start, end, b"mdia")
+        hdlr = mdia and _find_box(data, *mdia, b"hdlr")
+        if not hdlr or data[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+            continue
+        info.has_video = True
+        tkhd = _find_box(data, start, end, b"tkhd")
+        if tkhd:
+            w, h = struct.unpack_from(">II", data, tkhd[1] - 8)
+            info.width, info.height = w >> 16, h >> 16
+        minf = _find_box(data, *mdia, b"minf")
+        stbl = minf and _find_box(data, *minf, b"stbl")
+        stsd = stbl and _find_box(data, *stbl, b"stsd")
+        if stsd and stsd[1] - stsd[0] >= 16 + 36:
+            entry = stsd[0] + 8
+            info.codec = _codec_name(data[entry + 4:entry + 8].decode("latin1"))
+            if not info.width or not info.height:
+                info.width, info.height = struct.unpack_from(">HH", data, entry + 32)
+        break
+    return info
+
+
+# ── Matroska / WebM ──────────────────────────────────────────────
+
+_EBML_SEGMENT = 0x18538067
+_EBML_INFO = 0x1549A966
+_EBML_TIMECODE_SCALE = 0x2AD7B1
+_EBML_DURATION = 0x4489
+_EBML_TRACKS = 0x1654AE6B
+_EBML_TRACK_ENTRY = 0xAE
+_EBML_TRACK_TYPE = 0x83
+_EBML_CODEC_ID = 0x86
+_EBML_VIDEO = 0xE0
+_EBML_PIXEL_WIDTH = 0xB0
+_EBML_PIXEL_HEIGHT = 0xBA
+_EBML_CLUSTER = 0x1F43B675
+_EBML_DOCTYPE = 0x4282
+
+
+def _read_vint(data: bytes, pos: int, keep_marker: bool) -> tuple[int, int, bool]:
+    if pos >= len(data):
+        raise _Truncated
+    first = data[pos]
+    if first == 0:
+        raise ValueError("bad EBML length")
+    length = 9 - first.bit_length()
+    if pos + length > len(data):
+        raise _Truncated
+    value = first if keep_marker else first & ((1 << (8 - length)) - 1)
+    unknown = not keep_marker and value == (1 << (8 - length)) - 1
+    for b in data[pos + 1:pos + length]:
+        value = (value << 8) | b
+        unknown = unknown and b == 0xFF
+    return value, length, unknown
+
+
+def _iter_elements(data: bytes, start: int, end: int):
+    pos = start
+    while pos < end:
+        eid, n, _ = _read_vint(data, pos, keep_marker=True)
+        size, m, unknown = _read_vint(data, pos + n, keep_marker=False)
+        body = pos + n + m
+        stop = end if unknown else body + size
+        if stop > end:
+            # Elements straddling the end of a truncated file are only
+            # tolerated for clusters, which carry frames rather than headers.
+            if eid != _EBML_CLUSTER:
+                raise _Truncated
+            stop = end
+        yield eid, body, stop
+        pos = stop
+
+
+def _ebml_uint(data: bytes, start: int, end: int) -> int:
+    return int.from_bytes(data[start:end], "big")
+
+
+def _probe_matroska(data: bytes) -> VideoInfo:
+    info = VideoInfo(container="mkv")
+    segment = None
+    for eid, start, end in _iter_elements(data, 0, len(data)):
+        if eid == 0x1A45DFA3:
+            for cid, s, e in _iter_elements(data, start, end):
+                if cid == _EBML_DOCTYPE and data[s:e].rstrip(b"\0") == b"webm":
+                    info.container = "webm"
+        elif eid == _EBML_SEGMENT:
+            segment = (start, end)
+            break
+    if segment is None:
+        raise _Truncated
+
+    timecode_scale, raw_duration, seen_tracks = 1_000_000, None, False
+    for eid, start, end in _iter_elements(data, *segment):
+        if eid == _EBML_INFO:
+            for cid, s, e in _iter_elements(data, start, end):
+                if cid == _EBML_TIMECODE_SCALE:
+                    timecode_scale = _ebml_uint(data, s, e)
+                elif cid == _EBML_DURATION:
+                    raw_duration = struct.unpack(">f" if e - s == 4 else ">d", data[s:e])[0]
+        elif eid == _EBML_TRACKS:
+            seen_tracks = True
+            for tid, ts, te in _iter_elements(data, start, end):
+                if tid != _EBML_TRACK_ENTRY:
+                    continue
+                fields = {cid: (s, e) for cid, s, e in _iter_elements(data, ts, te)}
+                track_type = fields.get(_EBML_TRACK_TYPE)
+                if not track_type or _ebml_uint(data, *track_type) != 1:
+                    continue
+                info.has_video = True
+                if _EBML_CODEC_ID in fields:
+                    s, e = fields[_EBML_CODEC_ID]
+                    info.codec = _codec_name(data[s:e].rstrip(b"\0").decode("ascii", "replace"))
+                if _EBML_VIDEO in fields:
+                    for cid, s, e in _iter_elements(data, *fields[_EBML_VIDEO]):
+                        if cid == _EBML_PIXEL_WIDTH:
+                            info.width = _ebml_uint(data, s, e)
+                        elif cid == _EBML_PIXEL_HEIGHT:
+                            info.height = _ebml_uint(data, s, e)
+                break
+        elif eid == _EBML_CLUSTER:
+            break
+    if not seen_tracks:
+        raise _Truncated
+    if raw_duration is not None:
+        info.duration = raw_duration * timecode_scale / 1e9
+    return info
+
+
+# ── AVI ──────────────────────────────────────────────────────────
+
+def _iter_chunks(data: bytes, start: int, end: int):
+    pos = start
+    while pos + 8 <= end:
+        kind, size = struct.unpack_from("<4sI", data, pos)
+        if pos + 8 + size > end:
+            raise _Truncated
+        yield kind, pos + 8, pos + 8 + size
+        pos += 8 + size + (size & 1)
+
+
+def _probe_avi(data: bytes) -> VideoInfo:
+    info = VideoInfo(container="avi")
+    hdrl = None
+    for kind, start, end in _iter_chunks(data, 12, len(data)):
+        if kind == b"LIST" and data[start:start + 4] == b"hdrl":
+            hdrl = (start + 4, end)
+            break
+    if hdrl is None:
+        raise _Truncated
+
+    for kind, start, end in _iter_chunks(data, *hdrl):
+        if kind == b"avih" and end - start >= 40:
+            usec_per_frame, = struct.unpack_from("<I", data, start)
+            total_frames, = struct.unpack_from("<I", data, start + 16)
+            info.width, info.height = struct.unpack_from("<II", data, start + 32)
+            info.duration = usec_per_frame * total_frames / 1e6
+        elif kind == b"LIST" and data[start:start + 4] == b"strl":
+            strh = _find_chunk(data, start + 4, end, b"strh")
+            if strh and data[strh[0]:strh[0] + 4] == b"vids":
+                info.has_video = True
+                handler = data[strh[0] + 4:strh[0] + 8].decode("latin1").strip("\0 ")
+                info.codec = _codec_name(handler)
+    return info
+
+
+def _find_chunk(data: bytes, start: int, end: int, kind: bytes):
+    for k, s, e in _iter_chunks(data, start, end):
+        if k == kind:
+            return s, e
+    return None
+
+
+# ── Ogg ──────────────────────────────────────────────────────────
+
+def _probe_ogg(data: bytes) -> VideoInfo:
+    # Only the Theora identification header is inspected; Ogg does not
+    # store a duration up front, so it is left unknown.
+    info = VideoInfo(container="ogg")
+    pos = data.find(b"\x80theora")
+    if pos != -1 and pos + 20 <= len(data):
+        info.has_video = True
+        info.codec = "theora"
+        info.width = (data[pos + 14] << 16) | (data[pos + 15] << 8) | data[pos + 16]
+        info.height = (data[pos + 17] << 16) | (data[pos + 18] << 8) | data[pos + 19]
+    elif b"OVP80" in data[:4096]:
+        info.has_video = True
+        info.codec = "vp8"
+    return info
+
+
+# ── Public API ───────────────────────────────────────────────────
+
+def probe_video(data: bytes) -> VideoInfo:
+    """
+    Read the container header of ``data`` and return what it declares.
+    Raises ValueError when the container is unknown, corrupt or truncated.
+    """
+    try:
+        if data[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+            return _probe_isobmff(data)
+        if data[:4] == b"\x1a\x45\xdf\xa3":
+            return _probe_matroska(data)
+        if data[:4] == b"RIFF" and data[8:12] == b"AVI ":
+            return _probe_avi(data)
+        if data[:4] == b"OggS":
+            return _probe_ogg(data)
+    except _Truncated:
+        raise ValueError("الملف غير مكتمل أو تالف. يرجى إعادة تسجيل الفيديو.")
+    except (struct.error, IndexError, UnicodeDecodeError, ValueError):
+        raise ValueError("تعذّر قراءة ملف الفيديو. الملف تالف.")
+    raise ValueError("صيغة الملف غير مدعومة. الصيغ المدعومة: MP4, MOV, WebM, MKV, AVI, OGG.")
+
+
+def preflight_video(data: bytes) -> VideoInfo:
+    """
+    Validate an upload locally before it is sent anywhere.
+    Returns the probed VideoInfo or raises ValueError with a user-facing message.
+    """
+    info = probe_video(data)
+
+    if not info.has_video:
+        raise ValueError("الملف لا يحتوي على مسار فيديو.")
+    if info.codec and info.codec not in SUPPORTED_CODECS:
+        raise ValueError(f"ترميز الفيديو ({info.codec}) غير مدعوم.")
+    if info.width is not None and info.height is not None:
+        if min(info.width, info.height) < MIN_VIDEO_DIMENSION:
+            raise ValueError(
+                f"دقة الفيديو منخفضة جداً ({info.width}x{info.height})."
+            )
+    if info.duration is not None:
+        if info.duration < MIN_DURATION_SECONDS:
+            raise ValueError("الفيديو قصير جداً.")
+        if info.duration > MAX_DURATION_SECONDS:
+            raise ValueError(
+                f"الفيديو طويل جداً ({info.duration:.0f} ثانية). "
+                f"الحد الأقصى {MAX_DURATION_SECONDS} ثانية."
+            )
+    return info
@@ -0,0 +1,98 @@
+"""
+Search over SignAvatar name and description.
+
+Uses an SQLite FTS5 index kept in sync by triggers when it is available,
+and falls back to a plain ``icontains`` filter on other backends or on
+SQLite builds without FTS5.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.utils import OperationalError
+
+FTS_TABLE = "videos_signavatar_fts"
+SOURCE_TABLE = "videos_signavatar"
+
+FTS_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {SOURCE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"{FTS_TABLE}_ad": f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {SOURCE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"{FTS_TABLE}_au": f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {SOURCE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+}
+
+_fts_available = None
+
+
+def ensure_fts_index(conn=connection) -> bool:
+    """
+    Create the FTS5 table and its sync triggers where missing, and rebuild
+    the index if anything had to be created. SQLite drops a table's
+    triggers whenever a migration rebuilds it (e.g. AddField), so this runs
+    after every migrate. Returns whether the index is available.
+    """
+    global _fts_available
+    if conn.vendor != "sqlite" or SOURCE_TABLE not in conn.introspection.table_names():
+        return False
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"name, description, content='{SOURCE_TABLE}', content_rowid='id')"
+            )
+        except OperationalError:
+            return False  # SQLite built without FTS5
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+            [SOURCE_TABLE],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [sql for name, sql in FTS_TRIGGERS.items() if name not in existing]
+        for statement in missing:
+            cursor.execute(statement)
+        if missing:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _fts_available = None
+    return True
+
+
+def fts_available() -> bool:
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = (
+            connection.vendor == "sqlite"
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available
+
+
+def _fts_query(query: str) -> str:
+    # Quote every term so user input can't inject FTS5 operators, and
+    # prefix-match so partial words still find results while typing.
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def search_avatars(queryset, query: str):
+    query = query.strip()
+    if not query:
+        return queryset
+    if fts_available():
+        match = _fts_query(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+        ))
+    return queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
@@ -0,0 +1,49 @@
+from rest_framework import serializers
+from .models import Analysis, DailySchoolRollup, DailySignRollup, SignAvatar
+
+
+class AnalysisSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Analysis
+        fields = [
+            'id', 'matched_sign', 'outcome', 'result', 'error',
+            'describe_ms', 'match_ms', 'total_ms', 'created_at',
+        ]
+        read_only_fields = fields
+
+
+class DailySignRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailySignRollup
+        fields = ['day', 'sign_name', 'count', 'total_ms']
+        read_only_fields = fields
+
+
+class DailySchoolRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailySchoolRollup
+        fields = ['day', 'school_name', 'count', 'matched', 'failed', 'total_ms']
+        read_only_fields = fields
+
+
+class CatalogSignSerializer(serializers.ModelSerializer):
+    renditions = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SignAvatar
+        fields = ['name', 'content_hash', 'size', 'version', 'renditions']
+        read_only_fields = fields
+
+    def get_renditions(self, avatar):
+        # Only the uploaded original is stored today; the list leaves room
+        # for smaller encodes without a client change.
+        if not avatar.video:
+            return []
+        request = self.context.get('request')
+        url = avatar.video.url
+        return [{
+            'label': 'original',
+            'url': request.build_absolute_uri(url) if request else url,
+            'size': avatar.size,
+            'mime': 'video/mp4',
+        }]
@@ -0,0 +1,37 @@
+import hashlib
+
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import CatalogChange, SignAvatar
+
+
+def hash_file(field_file) -> str:
+    digest = hashlib.sha256()
+    with field_file.open('rb') as f:
+        for chunk in f.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@receiver(pre_save, sender=SignAvatar)
+def stamp_catalog_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.video and not instance.content_hash:
+        try:
+            instance.content_hash = hash_file(instance.video)
+            instance.size = instance.video.size
+        except OSError:
+            pass  # file missing from storage; retried on the next save
+
+    if instance.pk:
+        old_name = SignAvatar.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+        if old_name and old_name != instance.name:
+            CatalogChange.objects.create(name=old_name, deleted=True)
+    instance.version = CatalogChange.objects.create(name=instance.name).pk
+
+
+@receiver(post_delete, sender=SignAvatar)
+def record_catalog_deletion(sender, instance, **kwargs):
+    CatalogChange.objects.create(name=instance.name, deleted=True)
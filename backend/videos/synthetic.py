@@ -0,0 +1,172 @@
+"""
+Synthetic signs for scale testing.
+
+Descriptions are assembled from the same vocabulary the real step-1
+descriptions use (hands, hand shapes, movements, body locations), so
+prompt sizes and search behaviour are representative. Every synthetic
+record is named with SYNTHETIC_PREFIX so it can be told apart and removed.
+"""
+import io
+import random
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+try:
+    import av
+except ImportError:  # pragma: no cover - optional dependency
+    av = None
+
+SYNTHETIC_PREFIX = 'تجريبي '
+
+HANDS = ['اليد اليمنى', 'اليد اليسرى', 'كلتا اليدين']
+SHAPES = [
+    'مفتوحة مع تلاصق الأصابع', 'مقبوضة على شكل قبضة', 'ممدودة السبابة فقط',
+    'على شكل حرف C', 'مضمومة الأطراف', 'مفرودة الأصابع ومتباعدة',
+    'ممدودة السبابة والوسطى', 'مرفوعة الإبهام',
+]
+LOCATIONS = [
+    'أمام الصدر', 'بجانب الرأس', 'أمام الوجه', 'عند الذقن', 'فوق الكتف',
+    'عند مستوى البطن', 'بجانب الأذن', 'أمام الفم', 'عند الجبهة',
+]
+MOVEMENTS = [
+    'تتحرك إلى الأمام بحركة مستقيمة', 'ترسم دائرة صغيرة', 'تهتز يميناً ويساراً',
+    'تنخفض إلى الأسفل بسرعة', 'ترتفع ببطء إلى الأعلى', 'تلمس الموضع مرتين',
+    'تدور عند المعصم', 'تبتعد عن الجسم ثم تعود', 'تنقر بخفة ثم تتوقف',
+]
+PALMS = ['متجهة إلى الأسفل', 'متجهة إلى الأمام', 'متجهة نحو الجسم', 'متجهة إلى الأعلى']
+SPEEDS = ['بسرعة متوسطة', 'ببطء', 'بسرعة', 'بإيقاع منتظم']
+ENDINGS = [
+    'ثم تعود اليد إلى جانب الجسم.', 'وتبقى اليد ثابتة لحظة قبل أن تنخفض.',
+    'وتنتهي الحركة بإرخاء اليد.', 'ثم تتكرر الحركة مرة أخرى.',
+]
+
+_placeholder = None
+
+
+def synthetic_name(index: int) -> str:
+    return f'{SYNTHETIC_PREFIX}{index:05d}'
+
+
+def next_index() -> int:
+    """Index after the highest synthetic sign, so new names never collide."""
+    from .models import SignAvatar
+
+    last = (
+        SignAvatar.objects.filter(name__startswith=SYNTHETIC_PREFIX)
+        .order_by('-name').values_list('name', flat=True).first()
+    )
+    return int(last[len(SYNTHETIC_PREFIX):]) + 1 if last else 0
+
+
+def synthetic_description(rng: random.Random) -> str:
+    """Two to four sentences in the style of a step-1 movement description."""
+    sentences = []
+    for step in range(rng.randint(2, 4)):
+        opener = 'يبدأ الشخص برفع' if step == 0 else 'بعد ذلك، يحرك الشخص'
+        sentences.append(
+            f'{opener} {rng.choice(HANDS)} {rng.choice(LOCATIONS)}، حيث تكون الكف '
+            f'{rng.choice(SHAPES)} و{rng.choice(PALMS)}. '
+            f'ثم {rng.choice(MOVEMENTS)} {rng.choice(SPEEDS)} {rng.choice(ENDINGS)}'
+        )
+    return '\n\n'.join(sentences)
+
+
+def placeholder_video() -> bytes:
+    """A tiny valid MP4 (a few grey frames) built once per process."""
+    global _placeholder
+    if _placeholder is None:
+        _placeholder = _encode_placeholder() if av is not None else _minimal_mp4()
+    return _placeholder
+
+
+def _encode_placeholder() -> bytes:
+    buffer = io.BytesIO()
+    with av.open(buffer, mode='w', format='mp4') as container:
+        stream = container.add_stream('mpeg4', rate=10)
+        stream.width = stream.height = 64
+        stream.pix_fmt = 'yuv420p'
+        for _ in range(5):
+            frame = av.VideoFrame(64, 64, 'yuv420p')
+            for plane in frame.planes:
+                plane.update(bytes([128]) * plane.buffer_size)
+            container.mux(stream.encode(frame))
+        container.mux(stream.encode())
+    return buffer.getvalue()
+
+
+def _minimal_mp4() -> bytes:
+    # An ftyp box only: enough for storage and the admin panel, not for decoding.
+    return (20).to_bytes(4, 'big') + b'ftypisom' + (512).to_bytes(4, 'big') + b'isom'
+
+
+def build_signs(count: int, start: int = 0, seed: int = 0, write_files: bool = True) -> list:
+    """
+    Unsaved SignAvatar instances with content_hash and size filled in, for
+    bulk_create. Without ``write_files`` the records point at a video name
+    that was never stored, which is enough for code that only reads names.
+    """
+    from .models import SignAvatar
+
+    rng = random.Random(seed + start)
+    data = placeholder_video()
+    content_hash = hashlib.sha256(data).hexdigest()
+
+    signs = []
+    for index in range(start, start + count):
+        name = synthetic_name(index)
+        # Named and placed like uploaded avatars so find_avatar resolves them.
+        video_name = f'avatars/{name}.mp4'
+        if write_files:
+            video_name = default_storage.save(video_name, ContentFile(data))
+        signs.append(SignAvatar(
+            name=name,
+            video=video_name,
+            description=synthetic_description(rng),
+            content_hash=content_hash,
+            size=len(data),
+        ))
+    return signs
+
+
+def create_signs(count: int, start: int = 0, seed: int = 0, write_files: bool = True,
+                 batch_size: int = 500) -> int:
+    """
+    Bulk-insert synthetic signs, recording a catalog change for each so
+    delta syncs see them. bulk_create skips the catalog signals, so the
+    versions are stamped here. Each batch commits on its own; a batch that
+    fails removes the placeholder files it wrote.
+    """
+    from .models import CatalogChange, SignAvatar
+
+    created = 0
+    for offset in range(0, count, batch_size):
+        signs = build_signs(min(batch_size, count - offset), start + offset, seed, write_files)
+        try:
+            with transaction.atomic():
+                changes = CatalogChange.objects.bulk_create(CatalogChange(name=s.name) for s in signs)
+                for sign, change in zip(signs, changes):
+                    sign.version = change.pk
+                SignAvatar.objects.bulk_create(signs)
+        except Exception:
+            if write_files:
+                for sign in signs:
+                    default_storage.delete(sign.video.name)
+            raise
+        created += len(signs)
+    return created
+
+
+def delete_signs() -> int:
+    """Remove every synthetic sign and its placeholder file."""
+    from .models import SignAvatar
+
+    synthetic = SignAvatar.objects.filter(name__startswith=SYNTHETIC_PREFIX)
+    for video_name in synthetic.values_list('video', flat=True).iterator():
+        if video_name and default_storage.exists(video_name):
+            default_storage.delete(video_name)
+    count = synthetic.count()
+    synthetic.delete()
+    return count
@@ -1,3 +1,701 @@
-from django.test import TestCase
+import io
+import json
+import asyncio
+import time
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import fingerprint, live, utils, views
+from .cassette import Cassette
+from .deadline import Deadline, DeadlineExceeded
+from .history import record_analysis
+from .models import (
+    Analysis, CatalogChange, ChunkedUpload, DailySchoolRollup, DailySignRollup, SignAvatar,
+)
+from .preflight import preflight_video, probe_video
+from .search import FTS_TRIGGERS, fts_available, search_avatars
+from .synthetic import create_signs, delete_signs, synthetic_name
+from .upstream import CircuitBreaker, CircuitOpenError, hedged_call
+
+try:
+    import av
+except ImportError:  # pragma: no cover - optional dependency
+    av = None
+
+
+def encode_clip(container='mp4', codec='mpeg4', seconds=1.0, fps=10, size=96, options=None):
+    """A small grey test clip written with PyAV."""
+    buffer = io.BytesIO()
+    with av.open(buffer, mode='w', format=container, options=options or {}) as out:
+        stream = out.add_stream(codec, rate=fps)
+        stream.width = stream.height = size
+        stream.pix_fmt = 'yuv420p'
+        for i in range(max(1, round(seconds * fps))):
+            frame = av.VideoFrame(size, size, 'yuv420p')
+            for plane in frame.planes:
+                plane.update(bytes([(i * 7) % 256]) * plane.buffer_size)
+            frame.pts = i
+            out.mux(stream.encode(frame))
+        out.mux(stream.encode())
+    return buffer.getvalue()
+
+
+def encode_motion(container='mp4', seconds=2.0, fps=10, size=96, vertical=False):
+    """A grey clip with a white square sweeping across it, for fingerprints."""
+    block = size // 4
+    buffer = io.BytesIO()
+    with av.open(buffer, mode='w', format=container) as out:
+        stream = out.add_stream('mpeg4', rate=fps)
+        stream.width = stream.height = size
+        stream.pix_fmt = 'yuv420p'
+        count = max(1, round(seconds * fps))
+        for i in range(count):
+            at = (size - block) * i // max(1, count - 1)
+            frame = av.VideoFrame(size, size, 'yuv420p')
+            y = frame.planes[0]
+            rows = []
+            for row in range(size):
+                line = bytearray([80]) * y.line_size
+                inside = at <= row < at + block if vertical else size // 3 <= row < size // 3 + block
+                if inside:
+                    start = size // 3 if vertical else at
+                    line[start:start + block] = b'\xff' * block
+                rows.append(bytes(line))
+            y.update(b''.join(rows))
+            for plane in frame.planes[1:]:
+                plane.update(b'\x80' * plane.buffer_size)
+            frame.pts = i
+            out.mux(stream.encode(frame))
+        out.mux(stream.encode())
+    return buffer.getvalue()
+
+
+def encode_audio(container='mp4', codec='aac', seconds=1.0):
+    buffer = io.BytesIO()
+    with av.open(buffer, mode='w', format=container) as out:
+        stream = out.add_stream(codec, rate=48000)
+        samples = stream.codec_context.frame_size or 1024
+        for i in range(int(seconds * 48000 / samples)):
+            frame = av.AudioFrame(format='fltp', layout='stereo', samples=samples)
+            for plane in frame.planes:
+                plane.update(bytes(plane.buffer_size))
+            frame.sample_rate = 48000
+            frame.pts = i * samples
+            out.mux(stream.encode(frame))
+        out.mux(stream.encode())
+    return buffer.getvalue()
+
+
+@unittest.skipIf(av is None, 'PyAV is not installed')
+class PreflightTests(SimpleTestCase):
+    CONTAINERS = [
+        ('mp4', 'mpeg4', 'mp4', 'mpeg4'),
+        ('mov', 'mpeg4', 'mov', 'mpeg4'),
+        ('webm', 'libvpx', 'webm', 'vp8'),
+        ('matroska', 'mpeg4', 'mkv', 'mpeg4'),
+        ('avi', 'mpeg4', 'avi', 'mpeg4'),
+    ]
+
+    def test_valid_clips(self):
+        for fmt, codec, container, codec_name in self.CONTAINERS:
+            with self.subTest(container=container):
+                info = preflight_video(encode_clip(fmt, codec, seconds=2))
+                self.assertEqual(info.container, container)
+                self.assertTrue(info.has_video)
+                self.assertEqual(info.codec, codec_name)
+                self.assertEqual((info.width, info.height), (96, 96))
+                self.assertAlmostEqual(info.duration, 2, delta=0.3)
+
+    def test_truncated(self):
+        for fmt, codec, container, _ in self.CONTAINERS:
+            with self.subTest(container=container):
+                data = encode_clip(fmt, codec, seconds=2)
+                with self.assertRaisesMessage(ValueError, 'غير مكتمل'):
+                    # MP4/MOV keep moov at the end; the others keep headers up front.
+                    cut = len(data) // 2 if container in ('mp4', 'mov') else 60
+                    preflight_video(data[:cut])
+
+    def test_audio_only(self):
+        for fmt, codec in [('mp4', 'aac'), ('matroska', 'libopus'), ('ogg', 'libopus')]:
+            with self.subTest(container=fmt):
+                with self.assertRaisesMessage(ValueError, 'لا يحتوي على مسار فيديو'):
+                    preflight_video(encode_audio(fmt, codec))
+
+    def test_too_long(self):
+        for fmt, codec, container, _ in self.CONTAINERS:
+            with self.subTest(container=container):
+                with self.assertRaisesMessage(ValueError, 'طويل جداً'):
+                    preflight_video(encode_clip(fmt, codec, seconds=62, fps=1, size=64))
+
+    def test_too_small(self):
+        with self.assertRaisesMessage(ValueError, 'منخفضة جداً'):
+            preflight_video(encode_clip(size=32))
+
+    def test_fragmented_mp4(self):
+        data = encode_clip(seconds=2, options={'movflags': 'frag_keyframe+empty_moov'})
+        info = preflight_video(data)
+        self.assertEqual(info.container, 'mp4')
+        self.assertTrue(info.has_video)
+        self.assertTrue(info.duration is None or info.duration > 1)
+
+    def test_unknown_format(self):
+        with self.assertRaisesMessage(ValueError, 'غير مدعومة'):
+            probe_video(b'not a video at all')
+
+
+def fake_response(status=200, content='الإشارة: شكرا'):
+    resp = requests.Response()
+    resp.status_code = status
+    body = {'choices': [{'message': {'content': content}}]} if status < 400 else {'error': 'x'}
+    resp._content = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    return resp
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_threshold_and_probes_after_reset(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())       # the probe
+        self.assertFalse(breaker.allow())      # only one at a time
+        breaker.record_success()
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow())
+
+    def test_probe_without_outcome_is_released(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.release()
+        self.assertTrue(breaker.allow())
+
+
+class HedgedCallTests(SimpleTestCase):
+    def test_failover_runs_on_caller_thread(self):
+        def primary():
+            raise RuntimeError('primary down')
+        self.assertEqual(hedged_call(primary, lambda: 'fallback', hedge_after=None), 'fallback')
+
+    def test_primary_error_wins_when_both_fail(self):
+        def failing(message):
+            def call():
+                raise RuntimeError(message)
+            return call
+        with self.assertRaisesMessage(RuntimeError, 'primary'):
+            hedged_call(failing('primary'), failing('fallback'), hedge_after=None)
+        with self.assertRaisesMessage(RuntimeError, 'primary'):
+            hedged_call(failing('primary'), failing('fallback'), hedge_after=0.01)
+
+    def test_slow_primary_is_hedged(self):
+        def slow():
+            time.sleep(0.5)
+            return 'primary'
+        started = time.monotonic()
+        self.assertEqual(hedged_call(slow, lambda: 'fallback', hedge_after=0.05), 'fallback')
+        self.assertLess(time.monotonic() - started, 0.4)
+
+    def test_fast_primary_skips_fallback(self):
+        fallback = mock.Mock(return_value='fallback')
+        self.assertEqual(hedged_call(lambda: 'primary', fallback, hedge_after=1), 'primary')
+        fallback.assert_not_called()
+
+
+@override_settings(
+    ANALYSIS_MODELS={'match': {'model': 'primary', 'fallback': 'backup'}},
+    ANALYSIS_CIRCUIT_FAILURE_THRESHOLD=2,
+    ANALYSIS_CIRCUIT_RESET_SECONDS=0,
+    ANALYSIS_HEDGE_MIN_SAMPLES=10 ** 9,
+)
+class CallGeminiTests(SimpleTestCase):
+    def setUp(self):
+        utils._breakers.clear()
+        utils._latencies.clear()
+        self.calls = []
+
+    def call(self, responses):
+        def transport(stage, body, timeout):
+            self.calls.append(body['model'])
+            result = responses[body['model']]
+            if isinstance(result, Exception):
+                raise result
+            return result
+        with mock.patch.object(utils, 'transport', transport):
+            return utils._call_gemini([], stage='match', timeout=5)
+
+    def test_fails_over_to_backup(self):
+        result = self.call({'primary': fake_response(503), 'backup': fake_response()})
+        self.assertEqual(result, 'الإشارة: شكرا')
+        self.assertEqual(self.calls, ['primary', 'backup'])
+
+    def test_open_circuit_skips_primary(self):
+        down = {'primary': requests.ConnectionError('down'), 'backup': fake_response()}
+        self.call(down)
+        self.call(down)
+        self.assertTrue(utils._breaker('primary').is_open)
+
+        with override_settings(ANALYSIS_CIRCUIT_RESET_SECONDS=60):
+            utils._breakers.clear()
+            for _ in range(2):
+                utils._breaker('primary').record_failure()
+            self.calls.clear()
+            self.call(down)
+            self.assertEqual(self.calls, ['backup'])
+
+    def test_client_error_on_probe_closes_circuit(self):
+        breaker = utils._breaker('primary')
+        breaker.record_failure()
+        breaker.record_failure()
+        with self.assertRaises(RuntimeError):
+            self.call({'primary': fake_response(400), 'backup': fake_response(400)})
+        self.assertFalse(breaker.is_open)
+        self.assertEqual(self.call({'primary': fake_response(), 'backup': fake_response()}), 'الإشارة: شكرا')
+
+    def test_probe_ending_without_outcome_does_not_wedge_circuit(self):
+        breaker = utils._breaker('primary')
+        breaker.record_failure()
+        breaker.record_failure()
+        with self.assertRaises(ValueError):
+            self.call({'primary': ValueError('boom'), 'backup': ValueError('boom')})
+        self.assertTrue(breaker.allow())
+
+    def test_timeout_within_deadline_counts_against_breaker(self):
+        with override_settings(ANALYSIS_MODELS={'match': {'model': 'primary'}}):
+            with mock.patch.object(utils, 'transport', side_effect=requests.Timeout('slow')):
+                for _ in range(2):
+                    with self.assertRaises(RuntimeError) as raised:
+                        utils._call_gemini([], stage='match', timeout=120, deadline=Deadline(90))
+                    self.assertNotIsInstance(raised.exception, DeadlineExceeded)
+            self.assertTrue(utils._breaker('primary').is_open)
+
+    def test_timeout_at_deadline_spares_breaker(self):
+        deadline = Deadline(90)
+
+        def expire(stage, body, timeout):
+            deadline.expires_at = time.monotonic()
+            raise requests.Timeout('slow')
+        with override_settings(ANALYSIS_MODELS={'match': {'model': 'primary'}}):
+            with mock.patch.object(utils, 'transport', expire):
+                for _ in range(2):
+                    deadline.expires_at = time.monotonic() + 90
+                    with self.assertRaises(DeadlineExceeded):
+                        utils._call_gemini([], stage='match', timeout=5, deadline=deadline)
+            self.assertFalse(utils._breaker('primary').is_open)
+
+    def test_no_fallback_raises_circuit_open(self):
+        with override_settings(ANALYSIS_MODELS={'match': {'model': 'primary'}},
+                               ANALYSIS_CIRCUIT_RESET_SECONDS=60):
+            breaker = utils._breaker('primary')
+            breaker.record_failure()
+            breaker.record_failure()
+            with self.assertRaises(CircuitOpenError):
+                self.call({'primary': fake_response()})
+
+
+class AnalyzeVideosTests(SimpleTestCase):
+    def test_reads_clip_files_in_describe_workers(self):
+        files = [io.BytesIO(b'clip-%d' % i) for i in range(3)]
+        for f in files:
+            f.seek(0, io.SEEK_END)  # left at the end, as after hashing
+        with mock.patch.object(utils, 'describe_video', side_effect=lambda v, name, d: v.decode()), \
+                mock.patch.object(utils, 'match_descriptions', side_effect=lambda ds, d: [(None, x) for x in ds]), \
+                mock.patch.object(utils, '_catalog_version', return_value=1):
+            results = utils.analyze_videos([(f, 'clip.mp4') for f in files], concurrency=2)
+        self.assertEqual([r['description'] for r in results], ['clip-0', 'clip-1', 'clip-2'])
+
+
+class MatchDescriptionsTests(SimpleTestCase):
+    REFS = {'شكرا': 'تلمس اليد الذقن', 'مبارك': 'تتحرك اليدان من الصدر', 'مرحبا': 'تلوح اليد'}
+
+    def match(self, answer, count=2):
+        with mock.patch.object(utils, '_load_reference_descriptions', return_value=self.REFS), \
+                mock.patch.object(utils, '_call_gemini', return_value=answer), \
+                mock.patch.object(utils, 'match_description', return_value=(None, 'fallback')) as single:
+            return utils.match_descriptions(['a', 'b', 'c'][:count]), single
+
+    def test_prose_reference_to_another_clip(self):
+        answer = (
+            'المقطع: 1\n'
+            'الإشارة: شكرا\n'
+            'التوضيح: تلمس اليد الذقن، على عكس المقطع 2 الذي يبدأ من الصدر كما في مبارك.\n'
+            '\n'
+            'المقطع: ٢\n'
+            'الإشارة: مبارك\n'
+            'التوضيح: تتحرك اليدان من الصدر.\n'
+        )
+        matches, single = self.match(answer)
+        self.assertEqual([sign for sign, _ in matches], ['شكرا', 'مبارك'])
+        self.assertIn('على عكس المقطع 2', matches[0][1])
+        single.assert_not_called()
+
+    def test_clip_missing_from_answer_is_matched_alone(self):
+        matches, single = self.match('**المقطع: [1]**\n**الإشارة:** مرحبا\nالتوضيح: تلوح اليد.')
+        self.assertEqual(matches, [('مرحبا', '**الإشارة:** مرحبا\nالتوضيح: تلوح اليد.'), (None, 'fallback')])
+        single.assert_called_once_with('b', None)
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_distance(self):
+        a = [0b1111 << k for k in range(16)]
+        self.assertEqual(fingerprint.distance(a, a), 0)
+        self.assertEqual(fingerprint.distance(a, [0] * 16), 1)
+        self.assertEqual(fingerprint.distance(a, [0b10000] + a[:-1]), 0)   # one sample late
+        self.assertEqual(fingerprint.distance(a, [1 << 63] * 16, max_shift=0), 1)
+
+    def test_band_keys(self):
+        a = [(0xFF00FF << k) & (1 << 64) - 1 for k in range(16)]
+        keys = fingerprint.band_keys(a)
+        self.assertEqual(len(keys), fingerprint.BAND_COUNT)
+        self.assertEqual(keys, fingerprint.band_keys(list(a)))
+        self.assertEqual(fingerprint.band_keys([0] * 16), [])
+        near = a[:-1] + [a[-1] | 1]
+        self.assertTrue(set(keys) & set(fingerprint.band_keys(near)))
+
+    @unittest.skipIf(av is None, 'PyAV is not installed')
+    def test_reencoded_clip_is_near_and_other_motion_is_far(self):
+        masks = fingerprint.compute_fingerprint(encode_motion('mp4', fps=10))
+        self.assertEqual(len(masks), fingerprint.FRAME_COUNT)
+        self.assertTrue(any(masks))
+        for container, fps in [('mp4', 10), ('matroska', 15), ('avi', 12)]:
+            with self.subTest(container=container, fps=fps):
+                again = fingerprint.compute_fingerprint(encode_motion(container, fps=fps))
+                self.assertLessEqual(fingerprint.distance(masks, again), 0.1)
+        other = fingerprint.compute_fingerprint(encode_motion(vertical=True))
+        self.assertGreater(fingerprint.distance(masks, other), 0.5)
+
+    @unittest.skipIf(av is None, 'PyAV is not installed')
+    def test_seeking_samples_the_same_frames_as_decoding(self):
+        data = encode_clip(seconds=5, fps=25)
+        with av.open(io.BytesIO(data)) as container:
+            stream = container.streams.video[0]
+            seeking = fingerprint._sample_by_seeking(container, stream, *fingerprint._span(container, stream))
+        with av.open(io.BytesIO(data)) as container:
+            decoding = fingerprint._sample_by_decoding(container, container.streams.video[0])
+        self.assertEqual(len(seeking), fingerprint.FRAME_COUNT)
+        self.assertEqual(seeking, decoding)
+
+    def test_frames_without_timestamps_are_spaced_by_index(self):
+        frames = [mock.Mock(time=None, index=i) for i in range(40)]
+        container = mock.Mock(decode=mock.Mock(return_value=iter(frames)))
+        stream = mock.Mock(average_rate=10)
+        with mock.patch.object(fingerprint, '_thumbnail', side_effect=lambda f: f.index):
+            samples = fingerprint._sample_by_decoding(container, stream)
+        self.assertEqual(samples[0], 0)
+        self.assertEqual(samples[-1], 39)
+        self.assertEqual(len(set(samples)), fingerprint.FRAME_COUNT)
+
+    @unittest.skipIf(av is None, 'PyAV is not installed')
+    def test_undecodable_clip(self):
+        self.assertIsNone(fingerprint.compute_fingerprint(b'not a video at all'))
+
+
+class CassetteTests(SimpleTestCase):
+    def test_records_only_successful_responses(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cassette = Cassette(directory, 'auto')
+            for status in (429, 400, 503, 200):
+                with mock.patch.object(utils, 'http_send', return_value=fake_response(status)):
+                    self.assertEqual(cassette.send('match', {'n': status}, 5).status_code, status)
+            self.assertEqual(
+                sorted(p.name for p in cassette.directory.iterdir()),
+                [f"{Cassette.key({'n': 200})}.json"],
+            )
+
+
+class SearchIndexTests(TestCase):
+    def test_triggers_survive_migrations(self):
+        if not fts_available():
+            self.skipTest('SQLite FTS5 is not available')
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            triggers = {row[0] for row in cursor.fetchall()}
+        self.assertTrue(set(FTS_TRIGGERS) <= triggers)
+
+    def test_new_and_edited_signs_are_found(self):
+        sign = SignAvatar.objects.create(name='شكرا', video='avatars/a.mp4', description='تلمس اليد الذقن')
+        self.assertEqual(list(search_avatars(SignAvatar.objects.all(), 'الذقن')), [sign])
+        sign.description = 'ترسم اليد دائرة'
+        sign.save()
+        self.assertFalse(search_avatars(SignAvatar.objects.all(), 'الذقن').exists())
+        self.assertTrue(search_avatars(SignAvatar.objects.all(), 'دائرة').exists())
+
+
+class CatalogVersionTests(TestCase):
+    def test_version_is_rolled_back_with_a_failed_save(self):
+        before = CatalogChange.current_version()
+        with mock.patch.object(SignAvatar, '_save_table', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                SignAvatar(name='شكرا', video='avatars/a.mp4').save()
+        self.assertEqual(CatalogChange.current_version(), before)
+
+
+class AnalysisReuseTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user('teacher', password='x')
+        self.previous = Analysis.objects.create(
+            user=user, content_hash='a' * 64, outcome=Analysis.OUTCOME_MATCHED,
+            matched_sign='شكرا', result='الإشارة: شكرا', total_ms=1,
+            catalog_version=CatalogChange.current_version(),
+        )
+
+    def reuse(self):
+        with mock.patch.object(views, 'preflight_video'), \
+                mock.patch.object(views, 'compute_fingerprint', return_value=None) as fingerprint:
+            analysis, _ = views._reuse_previous(b'clip', 'a' * 64)
+        return analysis, fingerprint
+
+    def test_exact_hit_skips_fingerprint(self):
+        analysis, fingerprint = self.reuse()
+        self.assertEqual(analysis['reused_from'], self.previous.pk)
+        fingerprint.assert_not_called()
+
+    def test_catalog_change_invalidates_reuse(self):
+        SignAvatar.objects.create(name='مرحبا', video='avatars/b.mp4')
+        analysis, fingerprint = self.reuse()
+        self.assertIsNone(analysis)
+        fingerprint.assert_called_once()
+
+
+class SyntheticSignTests(TestCase):
+    def test_placeholders_are_served_like_uploaded_avatars(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            create_signs(2)
+            # avatar URLs are built as /media/avatars/<find_avatar()>
+            filename = utils.find_avatar(synthetic_name(1))
+            self.assertTrue((Path(media) / 'avatars' / filename).is_file())
+            self.assertEqual(delete_signs(), 2)
+            self.assertEqual(list((Path(media) / 'avatars').iterdir()), [])
+
+    def test_failed_batch_removes_its_files_and_keeps_earlier_batches(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            bulk_create = SignAvatar.objects.bulk_create
+            calls = []
+
+            def fail_second_batch(signs):
+                calls.append(signs)
+                if len(calls) == 2:
+                    raise RuntimeError('disk full')
+                return bulk_create(signs)
+            with mock.patch.object(SignAvatar.objects, 'bulk_create', fail_second_batch):
+                with self.assertRaises(RuntimeError):
+                    create_signs(4, batch_size=2)
+            self.assertEqual(SignAvatar.objects.count(), 2)
+            self.assertEqual(len(list((Path(media) / 'avatars').iterdir())), 2)
+            self.assertEqual(CatalogChange.objects.count(), 2)
+
+
+class MotionSegmenterTests(SimpleTestCase):
+    STILL, MOVED = bytes(64), bytes([255]) * 64
+
+    def feed(self, segmenter, moving=0, still=0):
+        """Feed ``moving`` alternating frames, then ``still`` copies of the last one."""
+        results = []
+        for i in range(moving):
+            results.append(segmenter.feed(self.MOVED if i % 2 == 0 else self.STILL))
+        for _ in range(still):
+            results.append(segmenter.feed(segmenter.previous or self.STILL))
+        return [r for r in results if r is not None]
+
+    def test_starts_on_motion_with_preroll(self):
+        segmenter = live.MotionSegmenter(fps=10)
+        self.assertEqual(self.feed(segmenter, still=20), [])
+        self.assertIsNone(segmenter.segment)
+        self.feed(segmenter, moving=1)
+        self.assertEqual(len(segmenter.segment), 5 + 1)   # PREROLL_SECONDS at 10 fps
+
+    def test_ends_once_hands_rest(self):
+        segmenter = live.MotionSegmenter(fps=10)
+        self.feed(segmenter, still=10)
+        self.assertEqual(self.feed(segmenter, moving=10, still=5), [])
+        [segment] = self.feed(segmenter, still=1)         # REST_SECONDS reached
+        self.assertEqual(len(segment), 5 + 10 + 6)
+        self.assertIsNone(segmenter.segment)
+
+    def test_long_motion_is_cut(self):
+        segmenter = live.MotionSegmenter(fps=10)
+        self.feed(segmenter, still=10)
+        segments = self.feed(segmenter, moving=130)
+        self.assertEqual([len(s) for s in segments], [60, 60])   # MAX_SEGMENT_SECONDS
+        self.assertEqual(len(segmenter.segment), 130 - 55 - 60)
+
+    def test_twitch_is_dropped(self):
+        segmenter = live.MotionSegmenter(fps=10)
+        self.feed(segmenter, still=10)
+        self.assertEqual(self.feed(segmenter, moving=3, still=20), [])
+        self.assertIsNone(segmenter.segment)
+
+
+class FrameBudgetTests(SimpleTestCase):
+    def test_steady_stream_at_declared_fps(self):
+        budget = live.FrameBudget(fps=10, now=0)
+        admitted = sum(budget.admit(i / 30) for i in range(300))   # 30 fps for 10 s
+        self.assertAlmostEqual(admitted, 10 * 10 + 20, delta=2)      # rate plus the initial burst
+
+    def test_burst_after_stall_passes(self):
+        budget = live.FrameBudget(fps=10, now=0)
+        for i in range(50):
+            budget.admit(i / 10)
+        # A 2 s stall, then the delayed frames all at once.
+        self.assertTrue(all(budget.admit(7.0) for _ in range(20)))
+        self.assertFalse(budget.admit(7.0))
+
+
+class LiveSessionTests(SimpleTestCase):
+    def test_recognition_error_is_reported_to_the_client(self):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def run():
+            session = live.LiveSession({'type': 'websocket'}, None, send)
+            await session._dispatch(None, [b''], 64, 64, 10)
+            await asyncio.gather(*session.pending)
+
+        with mock.patch.object(live, 'encode_segment', return_value=b'clip'), \
+                mock.patch.object(live, '_recognize', side_effect=RuntimeError('db down')):
+            asyncio.run(run())
+        messages = [json.loads(m['text']) for m in sent]
+        self.assertEqual(messages[-1], {'type': 'error', 'error': 'db down', 'status': 502, 'segment': 1})
+
+
+class ResumableUploadTests(TestCase):
+    DATA = bytes(range(256)) * 40
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(CHUNKED_UPLOAD_DIR=Path(directory.name))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('teacher', password='x'))
+
+    def create(self, length=len(DATA)):
+        response = self.client.post('/api/videos/uploads/', {'length': length, 'filename': 'clip.mp4'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return f"/api/videos/uploads/{response.data['upload_id']}/", ChunkedUpload.objects.get()
+
+    def patch(self, url, offset, data, **extra):
+        return self.client.generic('PATCH', url, data, 'application/offset+octet-stream',
+                                   HTTP_UPLOAD_OFFSET=str(offset), **extra)
+
+    def test_create(self):
+        url, upload = self.create()
+        self.assertTrue(upload.path.exists())
+        response = self.client.head(url)
+        self.assertEqual((response['Upload-Offset'], response['Upload-Length']), ('0', str(len(self.DATA))))
+        self.assertEqual(self.client.post('/api/videos/uploads/', {'length': 0}, format='json').status_code, 400)
+
+    def test_chunks_assemble_and_head_reports_progress(self):
+        url, upload = self.create()
+        self.assertEqual(self.patch(url, 0, self.DATA[:4000]).status_code, 204)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '4000')
+        response = self.patch(url, 4000, self.DATA[4000:])
+        self.assertEqual(response['Upload-Offset'], str(len(self.DATA)))
+        self.assertEqual(upload.path.read_bytes(), self.DATA)
+
+    def test_out_of_order_and_duplicate_chunks_conflict(self):
+        url, upload = self.create()
+        response = self.patch(url, 4000, self.DATA[4000:8000])
+        self.assertEqual((response.status_code, response.data['offset']), (409, 0))
+        self.patch(url, 0, self.DATA[:4000])
+        # A retry after a lost response must not append the chunk twice.
+        response = self.patch(url, 0, self.DATA[:4000])
+        self.assertEqual((response.status_code, response['Upload-Offset']), (409, '4000'))
+        self.assertEqual(upload.path.stat().st_size, 4000)
+
+    def test_body_over_declared_length(self):
+        url, upload = self.create(length=100)
+        self.assertEqual(self.patch(url, 0, self.DATA[:200]).status_code, 413)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '0')
+
+    def test_missing_content_length(self):
+        url, upload = self.create()
+        response = self.patch(url, 0, b'', CONTENT_LENGTH='', HTTP_TRANSFER_ENCODING='chunked')
+        self.assertEqual(response.status_code, 411)
+
+    def test_finalize_keeps_upload_after_upstream_failure(self):
+        url, upload = self.create()
+        self.patch(url, 0, self.DATA)
+        analysis = {'description': 'وصف', 'result': 'الإشارة: شكرا', 'matched_sign': None}
+        with mock.patch.object(views, '_reuse_previous', return_value=(None, None)):
+            for error, status in [(RuntimeError('API error 503'), 502), (DeadlineExceeded(), 504)]:
+                with mock.patch.object(views, 'analyze_video', side_effect=error):
+                    self.assertEqual(self.client.post(url + 'finalize/', {}, format='json').status_code, status)
+                self.assertTrue(upload.path.exists())
+            with mock.patch.object(views, 'analyze_video', return_value=analysis):
+                self.assertEqual(self.client.post(url + 'finalize/', {}, format='json').status_code, 200)
+        self.assertFalse(upload.path.exists())
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+
+class HistoryTests(TestCase):
+    def setUp(self):
+        users = get_user_model().objects
+        self.student = users.create_user('student', school_name='الأمل')
+        self.other = users.create_user('other', school_name='النور')
+        self.admin = users.create_user('admin', role='admin', school_name='الأمل')
+        self.client = APIClient()
+
+    def record(self, user, outcome, matched_sign=None, **analysis):
+        analysis = {'matched_sign': matched_sign, 'result': '', 'description': '', **analysis}
+        return record_analysis(user, 'a' * 64, outcome, time.monotonic(), analysis)
+
+    def test_history_is_paginated_and_limited_to_own_rows(self):
+        mine = [self.record(self.student, Analysis.OUTCOME_UNMATCHED).pk for _ in range(5)]
+        self.record(self.other, Analysis.OUTCOME_UNMATCHED)
+        self.client.force_authenticate(self.student)
+
+        seen, url = [], '/api/videos/history/?page_size=2'
+        while url:
+            page = self.client.get(url).data
+            self.assertLessEqual(len(page['results']), 2)
+            seen += [row['id'] for row in page['results']]
+            url = page['next']
+        self.assertEqual(seen, sorted(mine, reverse=True))
+
+    def test_rollup_counts(self):
+        self.record(self.student, Analysis.OUTCOME_MATCHED, 'شكرا')
+        first = self.record(self.admin, Analysis.OUTCOME_MATCHED, 'شكرا')
+        self.record(self.student, Analysis.OUTCOME_MATCHED, 'شكرا', reused_from=first.pk, reuse_distance=0.0)
+        self.record(self.student, Analysis.OUTCOME_UNMATCHED)
+        self.record(self.student, Analysis.OUTCOME_INVALID)
+        self.record(self.other, Analysis.OUTCOME_UPSTREAM_ERROR)
+
+        school = DailySchoolRollup.objects.get(school_name='الأمل')
+        self.assertEqual((school.count, school.matched, school.failed), (5, 3, 1))
+        other = DailySchoolRollup.objects.get(school_name='النور')
+        self.assertEqual((other.count, other.matched, other.failed), (1, 0, 1))
+        self.assertEqual(DailySignRollup.objects.get().count, 3)
+        self.assertEqual(Analysis.objects.filter(reused_from=first).count(), 1)
+
+    def test_rollup_views(self):
+        self.record(self.student, Analysis.OUTCOME_MATCHED, 'شكرا')
+        today = DailySignRollup.objects.get().day.isoformat()
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get('/api/videos/rollups/signs/').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(f'/api/videos/rollups/schools/?since={today}&until={today}')
+        self.assertEqual([row['school_name'] for row in response.data], ['الأمل'])
+        response = self.client.get('/api/videos/rollups/signs/?since=2000-01-01&until=2000-01-02')
+        self.assertEqual(response.data, [])
+        for query in ('since=yesterday', 'until=2026-13-01', 'since=2026-02-30'):
+            for url in ('/api/videos/rollups/signs/', '/api/videos/rollups/schools/'):
+                with self.subTest(url=url, query=query):
+                    self.assertEqual(self.client.get(f'{url}?{query}').status_code, 400)
@@ -0,0 +1,47 @@
+"""
+Upload handlers that enforce the video size limit while the request body
+is being streamed, so oversized uploads are never buffered in full.
+"""
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+# Room for multipart boundaries and the small text fields sent alongside.
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class MaxSizeUploadHandler(FileUploadHandler):
+    """
+    Aborts the upload as soon as a single file grows past ``max_bytes`` or
+    the body is declared larger than ``max_total`` (defaults to ``max_bytes``).
+    Check ``exceeded`` after the request data was parsed.
+    """
+
+    def __init__(self, request=None, max_bytes=0, max_total=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.max_total = max_total or max_bytes
+        self.exceeded = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Reject on the declared length before a single byte is read.
+        if content_length > self.max_total + MULTIPART_OVERHEAD:
+            self.exceeded = True
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            self.exceeded = True
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def limit_upload_size(request, max_bytes: int, max_total: int | None = None) -> MaxSizeUploadHandler:
+    """Install a MaxSizeUploadHandler in front of the request's handlers."""
+    handler = MaxSizeUploadHandler(request, max_bytes, max_total)
+    request.upload_handlers.insert(0, handler)
+    return handler
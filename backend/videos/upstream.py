@@ -0,0 +1,137 @@
+"""
+Resilience helpers for upstream model calls: a per-model circuit breaker,
+a rolling latency tracker and a hedged "first success wins" call.
+"""
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+
+from django.conf import settings
+
+# Shared by all requests so hedging can never spawn unbounded threads. Sized
+# by settings.ANALYSIS_UPSTREAM_WORKERS, as it bounds concurrent hedged calls.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ANALYSIS_UPSTREAM_WORKERS, thread_name_prefix="upstream",
+            )
+        return _executor
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream that is known to be unhealthy."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures. Once open, calls
+    are refused for ``reset_seconds``; after that a single probe is let
+    through and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._prober = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._probing = True
+                self._prober = threading.get_ident()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """
+        End a call on this thread. If it was the probe and recorded no
+        outcome (e.g. the request's deadline ran out) the next call may probe.
+        """
+        with self._lock:
+            if self._prober == threading.get_ident():
+                self._probing = False
+                self._prober = None
+
+
+class LatencyTracker:
+    """Keeps the last ``size`` latencies (seconds) and answers percentile queries."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 1) -> float | None:
+        with self._lock:
+            if len(self._samples) < max(min_samples, 1):
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+def hedged_call(primary, fallback, hedge_after: float | None):
+    """
+    Run ``primary()``; if it has not finished after ``hedge_after`` seconds
+    (or fails before then) also run ``fallback()`` and return whichever
+    succeeds first. The slower call is left to finish in the background,
+    bounded by its own timeout.
+
+    With ``hedge_after=None`` the fallback is only used as a failover. The
+    two calls never overlap then, so both run on the caller's thread.
+    """
+    if hedge_after is None:
+        try:
+            return primary()
+        except Exception as primary_error:
+            try:
+                return fallback()
+            except Exception:
+                raise primary_error
+
+    futures = [_pool().submit(primary)]
+    done, _ = wait(futures, timeout=hedge_after)
+    if not done or futures[0].exception() is not None:
+        futures.append(_pool().submit(fallback))
+
+    errors = {}
+    for future in as_completed(futures):
+        try:
+            return future.result()
+        except Exception as e:
+            errors[future] = e
+    # Prefer the primary's error: it is the one the caller configured.
+    raise errors.get(futures[0]) or next(iter(errors.values()))
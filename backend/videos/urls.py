@@ -3,6 +3,14 @@ from . import views
 
 urlpatterns = [
     path('analyze/', views.analyze_view, name='video_analyze'),
+    path('analyze/batch/', views.batch_analyze_view, name='video_analyze_batch'),
+    path('catalog/', views.catalog_view, name='video_catalog'),
+    path('uploads/', views.upload_create_view, name='upload_create'),
+    path('uploads/<uuid:upload_id>/', views.upload_detail_view, name='upload_detail'),
+    path('uploads/<uuid:upload_id>/finalize/', views.upload_finalize_view, name='upload_finalize'),
+    path('history/', views.history_view, name='video_history'),
+    path('rollups/signs/', views.sign_rollups_view, name='sign_rollups'),
+    path('rollups/schools/', views.school_rollups_view, name='school_rollups'),
 ]
 
 admin_panel_urlpatterns = [
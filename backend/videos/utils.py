@@ -5,23 +5,29 @@ Two-step video analysis:
            reference descriptions and picks the closest match.
 """
 import os
+import re
 import json
+import time
 import base64
 import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import IO
+
+from django.conf import settings
+
+from .deadline import Deadline, DeadlineExceeded
+from .preflight import preflight_video
+from .upstream import CircuitBreaker, CircuitOpenError, LatencyTracker, hedged_call
 
 API_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL = "google/gemini-3-flash-preview"
 MAX_FILE_SIZE_MB = 20
+MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 
-MIME_MAP = {
-    "mp4": "video/mp4",
-    "webm": "video/webm",
-    "ogg": "video/ogg",
-    "mov": "video/quicktime",
-    "avi": "video/x-msvideo",
-    "mkv": "video/x-matroska",
-}
+# Upper bounds per upstream call; a request's deadline can only shrink them.
+DESCRIBE_TIMEOUT = 300
+MATCH_TIMEOUT = 120
 
 DESCRIPTIONS_PATH = Path(__file__).resolve().parent.parent / "sign_descriptions.json"
 
@@ -72,30 +78,122 @@ def _load_reference_descriptions() -> dict[str, str]:
         return json.load(f)
 
 
-def _call_gemini(messages: list, timeout: int = 300) -> str:
-    body = {"model": MODEL, "messages": messages}
-    resp = requests.post(API_URL, headers=_headers(), json=body, timeout=timeout)
+_breakers: dict[str, CircuitBreaker] = {}
+_latencies: dict[tuple[str, str], LatencyTracker] = {}
+_registry_lock = threading.Lock()
+
+
+def _breaker(model: str) -> CircuitBreaker:
+    with _registry_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(
+                settings.ANALYSIS_CIRCUIT_FAILURE_THRESHOLD,
+                settings.ANALYSIS_CIRCUIT_RESET_SECONDS,
+            )
+        return _breakers[model]
+
+
+def _latency(stage: str, model: str) -> LatencyTracker:
+    with _registry_lock:
+        return _latencies.setdefault((stage, model), LatencyTracker())
+
+
+def http_send(stage: str, body: dict, timeout: float) -> requests.Response:
+    return requests.post(API_URL, headers=_headers(), json=body, timeout=timeout)
+
+
+# The single point where upstream traffic leaves the process. The evaluation
+# harness swaps it for a cassette to record or replay responses offline.
+transport = http_send
+
+
+def _post_chat(stage: str, model: str, messages: list, timeout: float,
+               deadline: Deadline | None = None) -> str:
+    """
+    One upstream call to ``model``, feeding its breaker and latency tracker.
+    A timeout that ran into the request's ``deadline`` says nothing about
+    the upstream's health and is raised as DeadlineExceeded instead.
+    """
+    breaker = _breaker(model)
+    started = time.monotonic()
+    body = {"model": model, "messages": messages}
+    try:
+        resp = transport(stage, body, timeout)
+    except requests.Timeout as e:
+        if deadline is not None and not deadline.remaining():
+            raise DeadlineExceeded() from e
+        breaker.record_failure()
+        raise RuntimeError(f"API request failed: {e}")
+    except requests.RequestException as e:
+        breaker.record_failure()
+        raise RuntimeError(f"API request failed: {e}")
+
     if resp.status_code >= 400:
+        # Only server-side trouble counts against the upstream's health;
+        # any other 4xx proves it is up and answering.
+        if resp.status_code >= 500 or resp.status_code == 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
         err = resp.content.decode("utf-8", errors="replace")
         raise RuntimeError(f"API error {resp.status_code}: {err[:500]}")
     data = _parse(resp)
     try:
-        return data["choices"][0]["message"]["content"]
+        content = data["choices"][0]["message"]["content"]
     except (KeyError, IndexError):
+        breaker.record_failure()
         raise RuntimeError(f"Unexpected API response: {json.dumps(data)[:500]}")
 
+    breaker.record_success()
+    _latency(stage, model).add(time.monotonic() - started)
+    return content
+
+
+def _call_gemini(messages: list, stage: str, timeout: float = DESCRIBE_TIMEOUT,
+                 deadline: Deadline | None = None) -> str:
+    """
+    Call the model configured for ``stage`` in settings.ANALYSIS_MODELS.
+    A slow primary is hedged with the stage's fallback model once it passes
+    the configured latency percentile; an open circuit fails over directly.
+    With a ``deadline`` every call's timeout is shrunk to the time left.
+    """
+    config = settings.ANALYSIS_MODELS[stage]
+    primary, fallback = config["model"], config.get("fallback")
+
+    def call(model):
+        budget = deadline.timeout(timeout) if deadline else timeout
+        breaker = _breaker(model)
+        if not breaker.allow():
+            raise CircuitOpenError("خدمة التحليل غير متاحة مؤقتاً، حاول مرة أخرى بعد قليل")
+        try:
+            return _post_chat(stage, model, messages, budget, deadline)
+        finally:
+            # A probe that ended without a verdict must not keep the circuit shut.
+            breaker.release()
+
+    if not fallback or fallback == primary:
+        return call(primary)
+    if _breaker(primary).is_open:
+        return hedged_call(lambda: call(primary), lambda: call(fallback), hedge_after=0)
+
+    hedge_after = _latency(stage, primary).percentile(
+        settings.ANALYSIS_HEDGE_PERCENTILE, settings.ANALYSIS_HEDGE_MIN_SAMPLES,
+    )
+    return hedged_call(lambda: call(primary), lambda: call(fallback), hedge_after)
+
 
 # ── Step 1: Describe the uploaded video ──────────────────────────
 
-def describe_video(video_bytes: bytes, filename: str) -> str:
+def describe_video(video_bytes: bytes, filename: str, deadline: Deadline | None = None) -> str:
     size_mb = len(video_bytes) / (1024 * 1024)
     if size_mb > MAX_FILE_SIZE_MB:
         raise ValueError(
             f"الملف كبير جداً ({size_mb:.1f} MB). الحد الأقصى {MAX_FILE_SIZE_MB} MB."
         )
 
-    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else "mp4"
-    mime = MIME_MAP.get(ext, "video/mp4")
+    # Reject truncated/audio-only/overlong clips before paying for an upstream call.
+    info = preflight_video(video_bytes)
+    mime = info.mime
     b64 = base64.b64encode(video_bytes).decode("ascii")
     data_url = f"data:{mime};base64,{b64}"
 
@@ -119,12 +217,12 @@ def describe_video(video_bytes: bytes, filename: str) -> str:
         },
     ]
 
-    return _call_gemini(messages)
+    return _call_gemini(messages, stage="describe", timeout=DESCRIBE_TIMEOUT, deadline=deadline)
 
 
 # ── Step 2: Match description against references ────────────────
 
-def match_description(video_description: str) -> tuple[str | None, str]:
+def match_description(video_description: str, deadline: Deadline | None = None) -> tuple[str | None, str]:
     """
     Returns (matched_sign_name_or_None, explanation_text).
     """
@@ -132,9 +230,7 @@ def match_description(video_description: str) -> tuple[str | None, str]:
     if not refs:
         return None, video_description
 
-    ref_block = ""
-    for i, (name, desc) in enumerate(refs.items(), 1):
-        ref_block += f"\n--- إشارة رقم {i}: {name} ---\n{desc}\n"
+    ref_block = _reference_block(refs)
 
     match_prompt = (
         "أنت خبير في لغة الإشارة. لديك وصف لحركات شخص في فيديو، "
@@ -165,37 +261,200 @@ def match_description(video_description: str) -> tuple[str | None, str]:
         {"role": "user", "content": match_prompt},
     ]
 
-    result = _call_gemini(messages, timeout=120)
+    result = _call_gemini(messages, stage="match", timeout=MATCH_TIMEOUT, deadline=deadline)
+    return _find_sign_name(result, refs), result
+
+
+def _reference_block(refs: dict[str, str]) -> str:
+    ref_block = ""
+    for i, (name, desc) in enumerate(refs.items(), 1):
+        ref_block += f"\n--- إشارة رقم {i}: {name} ---\n{desc}\n"
+    return ref_block
+
+
+# Answer lines, tolerating markdown emphasis around the labels.
+_SIGN_LINE = re.compile(r"^[ \t*#]*الإشارة[ \t*]*:(.*)$", re.M)
+_CLIP_HEADER = re.compile(r"^[ \t*#]*المقطع[ \t*]*:?[ \t]*\[?(\d+)\]?[ \t*:]*$", re.M)
+
+
+def _find_sign_name(text: str, refs: dict[str, str]) -> str | None:
+    # Prefer the answer's "الإشارة:" line; the explanation may mention other signs.
+    line = _SIGN_LINE.search(text)
+    if line:
+        text = line.group(1)
+    # Longest first, so a sign whose name contains another's wins.
+    for name in sorted(refs, key=len, reverse=True):
+        if name in text:
+            return name
+    return None
+
+
+_ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
+
+
+def match_descriptions(video_descriptions: list[str],
+                       deadline: Deadline | None = None) -> list[tuple[str | None, str]]:
+    """
+    Batch form of match_description: one upstream call for all descriptions.
+    Clips the combined answer leaves out are matched individually.
+    """
+    refs = _load_reference_descriptions()
+    if not refs:
+        return [(None, d) for d in video_descriptions]
+    if len(video_descriptions) == 1:
+        return [match_description(video_descriptions[0], deadline)]
+
+    clips_block = ""
+    for i, desc in enumerate(video_descriptions, 1):
+        clips_block += f"\n--- المقطع {i} ---\n{desc}\n"
+
+    match_prompt = (
+        "أنت خبير في لغة الإشارة. لديك أوصاف لحركات أشخاص في عدة مقاطع فيديو، "
+        "ولديك مرجع بأوصاف إشارات معروفة.\n\n"
+        "== أوصاف المقاطع المرسلة ==\n"
+        f"{clips_block}\n\n"
+        "== أوصاف الإشارات المرجعية ==\n"
+        f"{_reference_block(refs)}\n\n"
+        "المطلوب لكل مقطع على حدة:\n"
+        "1. قارن وصف المقطع مع كل إشارة مرجعية.\n"
+        "2. حدد أقرب إشارة تتطابق مع الحركات الموصوفة.\n"
+        "3. اشرح لماذا هذه الإشارة هي الأقرب (أوجه التشابه في الحركات).\n"
+        "4. إذا لم تتطابق مع أي إشارة بشكل معقول، قل ذلك.\n\n"
+        "أجب لكل مقطع بالترتيب بالصيغة التالية بالضبط:\n"
+        "المقطع: [رقم المقطع]\n"
+        "الإشارة: [اسم الإشارة أو 'غير معروفة']\n"
+        "التوضيح: [شرحك]\n"
+    )
+
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "You are a sign language matching expert. "
+                "You compare movement descriptions and find the closest match for each clip. "
+                "Reply in Arabic. Follow the exact response format requested."
+            ),
+        },
+        {"role": "user", "content": match_prompt},
+    ]
+
+    # Scale the timeout with the batch: the answer grows with every clip.
+    result = _call_gemini(
+        messages, stage="match",
+        timeout=MATCH_TIMEOUT + 15 * len(video_descriptions), deadline=deadline,
+    )
 
-    matched_name = None
-    for name in refs:
-        if name in result:
-            matched_name = name
-            break
+    # Split on header lines only: an explanation may refer to "المقطع 2" in prose.
+    sections = {}
+    parts = _CLIP_HEADER.split(result.translate(_ARABIC_DIGITS))
+    for number, text in zip(parts[1::2], parts[2::2]):
+        if _SIGN_LINE.search(text):
+            sections.setdefault(int(number), text.strip())
 
-    return matched_name, result
+    matches = []
+    for i, desc in enumerate(video_descriptions, 1):
+        if i in sections:
+            matches.append((_find_sign_name(sections[i], refs), sections[i]))
+        else:
+            matches.append(match_description(desc, deadline))
+    return matches
 
 
 # ── Main entry point ─────────────────────────────────────────────
 
-def analyze_video(video_bytes: bytes, filename: str, prompt: str = "") -> dict:
+def _catalog_version() -> int:
+    from .models import CatalogChange
+    return CatalogChange.current_version()
+
+
+def analyze_video(video_bytes: bytes, filename: str, prompt: str = "",
+                  deadline: Deadline | None = None) -> dict:
     """
     Returns {
         "description": "...",   # Step 1 output
         "result": "...",        # Step 2 matching output
-        "matched_sign": "..."   # Sign name or None
+        "matched_sign": "...",  # Sign name or None
+        "catalog_version": n,   # CatalogChange version the match was made against
+        "timings": {"describe_ms": ..., "match_ms": ...},
     }
     """
-    description = describe_video(video_bytes, filename)
-    matched_sign, match_result = match_description(description)
+    started = time.monotonic()
+    description = describe_video(video_bytes, filename, deadline)
+    described = time.monotonic()
+    catalog_version = _catalog_version()
+    matched_sign, match_result = match_description(description, deadline)
+    matched = time.monotonic()
 
     return {
         "description": description,
         "result": match_result,
         "matched_sign": matched_sign,
+        "catalog_version": catalog_version,
+        "timings": {
+            "describe_ms": round((described - started) * 1000),
+            "match_ms": round((matched - described) * 1000),
+        },
     }
 
 
+def analyze_videos(clips: list[tuple[bytes | IO[bytes], str]], concurrency: int = 4,
+                   deadline: Deadline | None = None) -> list[dict | Exception]:
+    """
+    Batch form of analyze_video for (video, filename) pairs, where video is
+    the clip's bytes or a file to read them from. Files are read only when
+    their step-1 call starts, so at most ``concurrency`` clips are in memory.
+    Step 1 runs for up to ``concurrency`` clips at once, then every clip that
+    was described is matched in a single step-2 call. Each entry of the
+    returned list is either the analyze_video() dict for that clip or the
+    exception that stopped it.
+    """
+    results: list[dict | Exception | None] = [None] * len(clips)
+    descriptions, describe_ms = {}, {}
+
+    def describe(i):
+        started = time.monotonic()
+        video, filename = clips[i]
+        if not isinstance(video, bytes):
+            video.seek(0)
+            video = video.read()
+        description = describe_video(video, filename, deadline)
+        describe_ms[i] = round((time.monotonic() - started) * 1000)
+        return description
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(describe, i): i for i in range(len(clips))}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                descriptions[i] = future.result()
+            except Exception as e:
+                results[i] = e
+
+    described = sorted(descriptions)
+    if not described:
+        return results
+
+    started = time.monotonic()
+    catalog_version = _catalog_version()
+    try:
+        matches = match_descriptions([descriptions[i] for i in described], deadline)
+    except Exception as e:
+        for i in described:
+            results[i] = e
+        return results
+    match_ms = round((time.monotonic() - started) * 1000)
+
+    for i, (matched_sign, match_result) in zip(described, matches):
+        results[i] = {
+            "description": descriptions[i],
+            "result": match_result,
+            "matched_sign": matched_sign,
+            "catalog_version": catalog_version,
+            "timings": {"describe_ms": describe_ms[i], "match_ms": match_ms},
+        }
+    return results
+
+
 def find_avatar(matched_sign: str | None) -> str | None:
     if not matched_sign:
         return None
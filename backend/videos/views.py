@@ -1,16 +1,57 @@
+import time
+import hashlib
 from urllib.parse import quote
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import UnreadablePostError
+from django.utils import timezone
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models.functions import Substr
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages as django_messages
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.parsers import JSONParser
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 
-from .models import SignAvatar
-from .utils import analyze_video, find_avatar, describe_video, rebuild_descriptions_json
+from accounts.permissions import IsAdminRole
+
+from .deadline import Deadline
+from .fingerprint import (
+    compute_fingerprint, find_exact_analysis, find_similar_analysis, store_fingerprint,
+)
+from .history import failure_outcome, record_analysis, success_outcome
+from .models import (
+    Analysis, CatalogChange, ChunkedUpload, DailySchoolRollup, DailySignRollup, SignAvatar,
+)
+from .preflight import preflight_video
+from .search import search_avatars
+from .serializers import (
+    AnalysisSerializer, CatalogSignSerializer, DailySchoolRollupSerializer,
+    DailySignRollupSerializer,
+)
+from .uploadhandlers import limit_upload_size
+from .utils import (
+    MAX_FILE_SIZE_BYTES, MAX_FILE_SIZE_MB,
+    analyze_video, analyze_videos, find_avatar, describe_video, rebuild_descriptions_json,
+)
+
+FILE_TOO_LARGE_ERROR = f'الملف كبير جداً. الحد الأقصى {MAX_FILE_SIZE_MB} MB.'
+AVATARS_PER_PAGE = 50
+UPLOAD_READ_SIZE = 64 * 1024
+
+
+class HistoryPagination(CursorPagination):
+    ordering = '-id'
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
 
 
 @api_view(['POST'])
@@ -24,55 +65,494 @@ def analyze_view(request):
       1. Gemini describes the movements
       2. Gemini matches against reference descriptions
     Returns: { "result": "...", "description": "...", "avatar_url": ... }
+    An optional X-Request-Timeout header (seconds) shortens the time budget.
     """
-    if 'video' not in request.FILES:
+    deadline = Deadline.from_request(request)
+    upload_limit = limit_upload_size(request, MAX_FILE_SIZE_BYTES)
+    files = request.FILES
+    if upload_limit.exceeded:
+        return Response(
+            {'error': FILE_TOO_LARGE_ERROR},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    if 'video' not in files:
         return Response(
             {'error': 'لم يتم إرسال ملف فيديو'},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    video_file = request.FILES['video']
+    video_file = files['video']
     video_bytes = video_file.read()
     filename = video_file.name or 'video.mp4'
     prompt = request.data.get('prompt', '')
+    return _run_analysis(request, video_bytes, filename, prompt, deadline)
 
-    try:
-        analysis = analyze_video(video_bytes, filename, prompt)
 
-        avatar_filename = find_avatar(analysis.get("matched_sign"))
-        avatar_url = None
-        if avatar_filename:
-            encoded_name = quote(avatar_filename)
-            avatar_url = request.build_absolute_uri(
-                f'/media/avatars/{encoded_name}'
-            )
+def _avatar_url(request, matched_sign):
+    avatar_filename = find_avatar(matched_sign)
+    if not avatar_filename:
+        return None
+    encoded_name = quote(avatar_filename)
+    return request.build_absolute_uri(f'/media/avatars/{encoded_name}')
+
+
+def _reuse_previous(video_bytes: bytes, content_hash: str, deadline: Deadline | None = None):
+    """
+    Preflight the clip and look for a recent analysis of the same or a
+    near-identical clip. Returns (reused analysis dict or None, fingerprint).
+    """
+    preflight_video(video_bytes)
+    # Classmates practising the same word send near-identical clips;
+    # answer those from a recent analysis instead of calling upstream.
+    catalog_version = CatalogChange.current_version()
+    masks, reuse_distance = None, 0.0
+    previous = find_exact_analysis(content_hash, catalog_version)
+    if not previous:
+        # Decoding the clip is only worth it when the cheap lookup missed.
+        if deadline is not None:
+            deadline.check()
+        masks = compute_fingerprint(video_bytes)
+        previous, reuse_distance = find_similar_analysis(masks, catalog_version)
+    if not previous:
+        return None, masks
+    return {
+        'description': previous.description,
+        'result': previous.result,
+        'matched_sign': previous.matched_sign or None,
+        'catalog_version': previous.catalog_version,
+        'reused_from': previous.reused_from_id or previous.pk,
+        'reuse_distance': reuse_distance,
+    }, masks
+
+
+def _record(request, content_hash, outcome, started, analysis, error, masks):
+    record = record_analysis(request.user, content_hash, outcome, started, analysis, error)
+    if masks and outcome in (Analysis.OUTCOME_MATCHED, Analysis.OUTCOME_UNMATCHED) \
+            and not record.reused_from_id:
+        store_fingerprint(record, masks)
+    return record
+
 
-        return Response({
+def _run_analysis(request, video_bytes: bytes, filename: str, prompt: str = '',
+                  deadline: Deadline | None = None):
+    """Analyze the video, record it in the history and build the API response."""
+    started = time.monotonic()
+    content_hash = hashlib.sha256(video_bytes).hexdigest()
+    analysis, error, masks = None, '', None
+
+    try:
+        analysis, masks = _reuse_previous(video_bytes, content_hash, deadline)
+        if analysis is None:
+            analysis = analyze_video(video_bytes, filename, prompt, deadline)
+
+        outcome = success_outcome(analysis)
+        response = Response({
             'result': analysis['result'],
             'description': analysis['description'],
             'matched_sign': analysis.get('matched_sign'),
-            'avatar_url': avatar_url,
+            'avatar_url': _avatar_url(request, analysis.get('matched_sign')),
         })
-    except ValueError as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-    except RuntimeError as e:
-        return Response({'error': str(e)}, status=status.HTTP_502_BAD_GATEWAY)
     except Exception as e:
+        outcome, http_status, error = failure_outcome(e)
+        response = Response({'error': error}, status=http_status)
+
+    record = _record(request, content_hash, outcome, started, analysis, error, masks)
+    if response.status_code == status.HTTP_200_OK:
+        response.data['analysis_id'] = record.pk
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminRole])
+@parser_classes([MultiPartParser, FormParser])
+def batch_analyze_view(request):
+    """
+    POST /api/videos/analyze/batch/
+    Multipart form: one or more "videos" files.
+    Step 1 runs concurrently for all clips, then every description is
+    matched in a single step-2 call.
+    Returns: { "results": [ {index, filename, ...} ], "succeeded": n, "failed": n }
+    Each result carries the same fields as /api/videos/analyze/, or "error"
+    and "status" when that clip failed.
+    """
+    deadline = Deadline.from_request(request, settings.BATCH_DEADLINE_SECONDS)
+    upload_limit = limit_upload_size(
+        request, MAX_FILE_SIZE_BYTES, max_total=settings.BATCH_MAX_TOTAL_MB * 1024 * 1024,
+    )
+    files = request.FILES
+    if upload_limit.exceeded:
+        return Response(
+            {'error': f'{FILE_TOO_LARGE_ERROR} مجموع الملفات حتى {settings.BATCH_MAX_TOTAL_MB} MB.'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    video_files = files.getlist('videos')
+    if not video_files:
+        return Response(
+            {'error': 'لم يتم إرسال ملفات فيديو'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(video_files) > settings.BATCH_MAX_CLIPS:
+        return Response(
+            {'error': f'الحد الأقصى {settings.BATCH_MAX_CLIPS} مقطعاً في الطلب الواحد'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    started = time.monotonic()
+    clips = []
+    # Only one clip is held in memory here; the describe workers read the
+    # others back from their upload files when their turn comes.
+    for video_file in video_files:
+        video_bytes = video_file.read()
+        clip = {
+            'file': video_file,
+            'filename': video_file.name or 'video.mp4',
+            'hash': hashlib.sha256(video_bytes).hexdigest(),
+            'analysis': None,
+            'masks': None,
+            'error': None,
+        }
+        try:
+            clip['analysis'], clip['masks'] = _reuse_previous(video_bytes, clip['hash'], deadline)
+        except Exception as e:
+            clip['error'] = e
+        clips.append(clip)
+
+    pending = [c for c in clips if c['analysis'] is None and c['error'] is None]
+    outcomes = analyze_videos(
+        [(c['file'], c['filename']) for c in pending],
+        concurrency=settings.BATCH_DESCRIBE_CONCURRENCY,
+        deadline=deadline,
+    )
+    for clip, outcome in zip(pending, outcomes):
+        if isinstance(outcome, Exception):
+            clip['error'] = outcome
+        else:
+            clip['analysis'] = outcome
+
+    results = []
+    for index, clip in enumerate(clips):
+        entry = {'index': index, 'filename': clip['filename']}
+        if clip['error'] is not None:
+            outcome, http_status, error = failure_outcome(clip['error'])
+            entry.update({'error': error, 'status': http_status})
+        else:
+            outcome, error = success_outcome(clip['analysis']), ''
+            entry.update({
+                'result': clip['analysis']['result'],
+                'description': clip['analysis']['description'],
+                'matched_sign': clip['analysis'].get('matched_sign'),
+                'avatar_url': _avatar_url(request, clip['analysis'].get('matched_sign')),
+            })
+        record = _record(request, clip['hash'], outcome, started, clip['analysis'], error, clip['masks'])
+        if clip['error'] is None:
+            entry['analysis_id'] = record.pk
+        results.append(entry)
+
+    failed = sum(1 for r in results if 'error' in r)
+    return Response({
+        'results': results,
+        'succeeded': len(results) - failed,
+        'failed': failed,
+    })
+
+
+# ── Resumable uploads ────────────────────────────────────────────
+#
+# tus-like protocol so a dropped connection only costs the current chunk:
+#   POST   /api/videos/uploads/                 { "length": n, "filename": "..." }
+#   PATCH  /api/videos/uploads/<id>/            Upload-Offset header + raw bytes
+#   HEAD   /api/videos/uploads/<id>/            current Upload-Offset
+#   POST   /api/videos/uploads/<id>/finalize/   runs the analysis
+
+def _upload_headers(upload):
+    return {
+        'Upload-Offset': str(upload.offset),
+        'Upload-Length': str(upload.length),
+    }
+
+
+def _purge_expired_uploads():
+    cutoff = timezone.now() - settings.CHUNKED_UPLOAD_EXPIRY
+    for upload in ChunkedUpload.objects.filter(created_at__lt=cutoff):
+        upload.discard()
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser, FormParser])
+def upload_create_view(request):
+    """
+    POST /api/videos/uploads/
+    Body: { "length": <total bytes>, "filename": "clip.mp4" }
+    Returns 201: { "upload_id", "offset", "length" } + Location header
+    """
+    try:
+        length = int(request.data.get('length', 0))
+    except (TypeError, ValueError):
+        length = 0
+    if length <= 0:
+        return Response({'error': 'حجم الملف غير صالح'}, status=status.HTTP_400_BAD_REQUEST)
+    if length > MAX_FILE_SIZE_BYTES:
         return Response(
-            {'error': f'خطأ غير متوقع: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            {'error': FILE_TOO_LARGE_ERROR},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
         )
 
+    _purge_expired_uploads()
+    upload = ChunkedUpload.objects.create(
+        user=request.user,
+        filename=str(request.data.get('filename') or 'video.mp4')[:255],
+        length=length,
+    )
+    settings.CHUNKED_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    upload.path.touch()
+
+    location = request.build_absolute_uri(f'/api/videos/uploads/{upload.id}/')
+    return Response(
+        {'upload_id': str(upload.id), 'offset': 0, 'length': length},
+        status=status.HTTP_201_CREATED,
+        headers={'Location': location, **_upload_headers(upload)},
+    )
+
+
+@api_view(['GET', 'HEAD', 'PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_detail_view(request, upload_id):
+    """
+    GET/HEAD /api/videos/uploads/<id>/  → { "offset", "length" }
+    PATCH    /api/videos/uploads/<id>/  → append the raw body at Upload-Offset
+    DELETE   /api/videos/uploads/<id>/  → abort the upload
+    """
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+
+    if request.method == 'DELETE':
+        upload.discard()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    if request.method in ('GET', 'HEAD'):
+        return Response(
+            {'offset': upload.offset, 'length': upload.length},
+            headers=_upload_headers(upload),
+        )
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return Response({'error': 'Upload-Offset مفقود'}, status=status.HTTP_400_BAD_REQUEST)
+    if offset != upload.offset:
+        # The client is out of sync (e.g. a lost response); it should HEAD and resume.
+        return Response(
+            {'error': 'Upload-Offset غير متطابق', 'offset': upload.offset},
+            status=status.HTTP_409_CONFLICT,
+            headers=_upload_headers(upload),
+        )
+
+    # Without a length (e.g. chunked transfer encoding) the body can't be read
+    # here, and accepting it would report progress that never happened.
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or '')
+    except ValueError:
+        return Response(
+            {'error': 'Content-Length مطلوب'},
+            status=status.HTTP_411_LENGTH_REQUIRED,
+            headers=_upload_headers(upload),
+        )
+    if offset + content_length > upload.length:
+        return Response(
+            {'error': 'البيانات تتجاوز الحجم المعلن'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            headers=_upload_headers(upload),
+        )
+
+    # Stream the body straight to disk; only UPLOAD_READ_SIZE bytes are held at once.
+    written = 0
+    with open(upload.path, 'r+b') as f:
+        f.seek(offset)
+        try:
+            while True:
+                chunk = request.stream.read(UPLOAD_READ_SIZE) if request.stream else b''
+                if not chunk:
+                    break
+                if offset + written + len(chunk) > upload.length:
+                    return Response(
+                        {'error': 'البيانات تتجاوز الحجم المعلن'},
+                        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        headers=_upload_headers(upload),
+                    )
+                f.write(chunk)
+                written += len(chunk)
+        except (UnreadablePostError, OSError):
+            # Connection dropped mid-chunk: keep what arrived so the client resumes from there.
+            pass
+
+    # Conditional update: a concurrent PATCH for the same offset can only win once.
+    updated = ChunkedUpload.objects.filter(pk=upload.pk, offset=offset).update(offset=offset + written)
+    if not updated:
+        upload.refresh_from_db()
+        return Response(
+            {'error': 'Upload-Offset غير متطابق', 'offset': upload.offset},
+            status=status.HTTP_409_CONFLICT,
+            headers=_upload_headers(upload),
+        )
+    upload.offset = offset + written
+    return Response(status=status.HTTP_204_NO_CONTENT, headers=_upload_headers(upload))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser, FormParser])
+def upload_finalize_view(request, upload_id):
+    """
+    POST /api/videos/uploads/<id>/finalize/
+    Body: optional { "prompt": "..." }
+    Analyzes the assembled file; same response as /api/videos/analyze/.
+    """
+    deadline = Deadline.from_request(request)
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    if not upload.is_complete:
+        return Response(
+            {'error': 'لم يكتمل رفع الملف بعد', 'offset': upload.offset},
+            status=status.HTTP_409_CONFLICT,
+            headers=_upload_headers(upload),
+        )
+
+    video_bytes = upload.path.read_bytes()
+    response = _run_analysis(request, video_bytes, upload.filename, request.data.get('prompt', ''), deadline)
+    # Keep the file when upstream failed so the client can retry finalize
+    # without re-uploading; expiry cleans up uploads that are never retried.
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST):
+        upload.discard()
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@transaction.atomic  # one snapshot: the version and the signs it covers
+def catalog_view(request):
+    """
+    GET /api/videos/catalog/[?since=<version>]
+    Every sign with its content hash and video renditions, for client prefetch.
+    With ?since only signs changed after that version are listed, plus the
+    names deleted since then. Honors If-None-Match against the version ETag.
+    Returns: { "version", "full", "signs": [...], "deleted": [...] }
+    """
+    version = CatalogChange.current_version()
+    etag = f'"catalog-{version}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+    if_none_match = request.headers.get('If-None-Match', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        since = int(request.query_params.get('since', 0))
+    except ValueError:
+        since = 0
+    # A version from the future (e.g. after a DB reset) can't be diffed against.
+    full = since <= 0 or since > version
+
+    avatars = SignAvatar.objects.defer('description').order_by('name')
+    deleted = []
+    if not full:
+        avatars = avatars.filter(version__gt=since)
+        removed = set(
+            CatalogChange.objects.filter(id__gt=since, deleted=True).values_list('name', flat=True)
+        )
+        # A sign deleted and then re-created is an update, not a deletion.
+        removed -= set(SignAvatar.objects.filter(name__in=removed).values_list('name', flat=True))
+        deleted = sorted(removed)
+
+    return Response({
+        'version': version,
+        'full': full,
+        'signs': CatalogSignSerializer(avatars, many=True, context={'request': request}).data,
+        'deleted': deleted,
+    }, headers=headers)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def history_view(request):
+    """
+    GET /api/videos/history/?cursor=...&page_size=...
+    The current user's past analyses, newest first.
+    Returns: { "next": url|null, "previous": url|null, "results": [...] }
+    """
+    paginator = HistoryPagination()
+    page = paginator.paginate_queryset(
+        Analysis.objects.filter(user=request.user), request,
+    )
+    return paginator.get_paginated_response(AnalysisSerializer(page, many=True).data)
+
+
+def _rollup_range(request, queryset):
+    since = request.query_params.get('since')
+    until = request.query_params.get('until')
+    if since:
+        queryset = queryset.filter(day__gte=since)
+    if until:
+        queryset = queryset.filter(day__lte=until)
+    return queryset
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminRole])
+def sign_rollups_view(request):
+    """
+    GET /api/videos/rollups/signs/?since=YYYY-MM-DD&until=YYYY-MM-DD
+    Daily match counts and latency per sign (admins only).
+    """
+    try:
+        rollups = list(_rollup_range(request, DailySignRollup.objects.all()))
+    except ValidationError:
+        return Response({'error': 'تاريخ غير صالح'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(DailySignRollupSerializer(rollups, many=True).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminRole])
+def school_rollups_view(request):
+    """
+    GET /api/videos/rollups/schools/?since=YYYY-MM-DD&until=YYYY-MM-DD
+    Daily analysis counts, outcomes and latency per school (admins only).
+    """
+    try:
+        rollups = list(_rollup_range(request, DailySchoolRollup.objects.all()))
+    except ValidationError:
+        return Response({'error': 'تاريخ غير صالح'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(DailySchoolRollupSerializer(rollups, many=True).data)
+
 
 # ── Admin Panel Views ────────────────────────────────────────────
 
 def avatar_list(request):
-    avatars = SignAvatar.objects.all()
-    return render(request, 'videos/avatar_list.html', {'avatars': avatars})
+    query = request.GET.get('q', '').strip()
+    # Only a short preview of each description is shown, so don't load the full text.
+    avatars = (
+        SignAvatar.objects
+        .defer('description')
+        .annotate(description_preview=Substr('description', 1, 120))
+    )
+    avatars = search_avatars(avatars, query)
+
+    page_obj = Paginator(avatars, AVATARS_PER_PAGE).get_page(request.GET.get('page'))
+    return render(request, 'videos/avatar_list.html', {
+        'avatars': page_obj,
+        'page_obj': page_obj,
+        'query': query,
+    })
 
 
 def avatar_upload(request):
     if request.method == 'POST':
+        upload_limit = limit_upload_size(request, MAX_FILE_SIZE_BYTES)
+        request.POST  # parse the body now so the size limit applies
+        if upload_limit.exceeded:
+            django_messages.error(request, FILE_TOO_LARGE_ERROR)
+            return render(request, 'videos/avatar_upload.html')
+
         name = request.POST.get('name', '').strip()
         video_file = request.FILES.get('video')
 